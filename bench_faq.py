@@ -0,0 +1,71 @@
+import random
+import time
+
+from faq_engine import FaqEngine
+
+# Benchmark FAQ matching over a few thousand synthetic entries in every supported script:
+#   python bench_faq.py
+ENTRIES = 3000
+QUERIES = 20000
+
+# Base consonants for each script, used to build pseudo-words
+SCRIPTS = {
+    "en": "bcdfghjklmnpqrstvwxyz",
+    "hi": "कखगघचछजझटठडढतथदधनपफबभमयरलवशसह",
+    "mr": "कखगघचछजझटठडढणतथदधनपफबभमयरलवशसहळ",
+    "bn": "কখগঘচছজঝটঠডঢতথদধনপফবভমযরলশসহ",
+    "ta": "கஙசஞடணதநபமயரலவழளறன",
+    "te": "కఖగఘచఛజఝటఠడఢణతథదధనపఫబభమయరలవశషసహ",
+}
+VOWELS = {"en": "aeiou", "hi": "ािीुूे", "mr": "ािीुूे", "bn": "ািীুূে", "ta": "ாிீுூெ", "te": "ాిీుూె"}
+
+
+def word(rng, lang):
+    return "".join(rng.choice(SCRIPTS[lang]) + rng.choice(VOWELS[lang]) for _ in range(rng.randint(2, 4)))
+
+
+def phrase(rng, lang):
+    return " ".join(word(rng, lang) for _ in range(rng.randint(1, 4)))
+
+
+def make_entries(rng):
+    entries = []
+    for i in range(ENTRIES):
+        questions = {lang: [phrase(rng, lang) for _ in range(2)] for lang in SCRIPTS}
+        answers = {lang: f"answer {i} ({lang})" for lang in SCRIPTS}
+        entries.append({"key": f"topic {i}", "questions": questions, "answers": answers})
+    return entries
+
+
+def typo(rng, text):
+    chars = list(text)
+    chars[rng.randrange(len(chars))] = chars[rng.randrange(len(chars))]
+    return "".join(chars)
+
+
+def main():
+    rng = random.Random(7)
+    entries = make_entries(rng)
+
+    started = time.perf_counter()
+    engine = FaqEngine(entries)
+    build = time.perf_counter() - started
+
+    questions = [q for entry in entries for qs in entry["questions"].values() for q in qs]
+    exact = [rng.choice(questions) for _ in range(QUERIES)]
+    fuzzy = [typo(rng, q) for q in exact]
+
+    for name, queries in (("exact", exact), ("fuzzy", fuzzy)):
+        hits = 0
+        started = time.perf_counter()
+        for query in queries:
+            if engine.match(query) is not None:
+                hits += 1
+        elapsed = time.perf_counter() - started
+        print(f"{name:>5}: {elapsed / len(queries) * 1e6:8.1f} us/query, {hits / len(queries):.1%} matched")
+    print(f"index: {ENTRIES} entries, {len(engine.aliases)} aliases, "
+          f"{len(engine.postings)} grams, built in {build * 1000:.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
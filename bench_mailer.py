@@ -0,0 +1,51 @@
+import asyncio
+import random
+import tempfile
+import time
+
+from mailer import COMPILED_TEMPLATES, ConfirmationMailer, FileTransport, booking_key
+
+# Render and deliver confirmation emails to the file transport, without SMTP:
+#   python bench_mailer.py
+# Every payment's confirmation is enqueued twice (a retried background task); only one email
+# each goes out.
+BOOKINGS = 10000
+
+
+def make_booking(rng, i):
+    event = {
+        "id": str(rng.randint(1, 12)),
+        "title": f"Exhibition {i % 12} & Friends",
+        "date": "2024-09-14",
+        "time": "6 PM",
+    }
+    tickets = rng.randint(1, 6)
+    first = rng.randint(1, 400)
+    return f"visitor{i}@example.com", event, tickets, list(range(first, first + tickets)), rng.choice(list(COMPILED_TEMPLATES))
+
+
+async def run(bookings, directory):
+    transport = FileTransport(directory)
+    mailer = ConfirmationMailer(transport)
+    queued = 0
+    for _ in range(2):
+        for i, (email, event, tickets, seats, locale) in enumerate(bookings):
+            queued += mailer.enqueue(booking_key("bench", "payment", i), email, event, tickets, seats, locale)
+    await mailer.flush()
+    return queued, transport.count
+
+
+def main():
+    rng = random.Random(1)
+    bookings = [make_booking(rng, i) for i in range(BOOKINGS)]
+    with tempfile.TemporaryDirectory() as directory:
+        started = time.perf_counter()
+        queued, written = asyncio.run(run(bookings, directory))
+        elapsed = time.perf_counter() - started
+    assert queued == written == BOOKINGS
+    print(f"{BOOKINGS} confirmations enqueued twice, {written} emails written")
+    print(f"render + send: {elapsed:.2f} s ({elapsed / written * 1e6:.0f} us/email)")
+
+
+if __name__ == "__main__":
+    main()
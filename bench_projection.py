@@ -0,0 +1,83 @@
+import asyncio
+import random
+import time
+from typing import List
+
+import bson
+from bson import ObjectId
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_response_field
+
+from model import Shows
+from responses import projection, validated_response
+
+# Per-request CPU for /shows on a 10k-document catalog, without a database:
+#   python bench_projection.py
+# "before" decodes whole documents and lets FastAPI validate and serialize them against
+# response_model; "after" decodes only the projected fields, validates once and dumps JSON.
+DOCUMENTS = 10000
+ROUNDS = 10
+
+
+def make_show(rng, i):
+    return {
+        "_id": ObjectId(),
+        "image": f"https://example.com/images/{i}.jpg",
+        "title": f"Exhibition {i}",
+        "date": "2024-09-14",
+        "time": "6 PM",
+        "location": rng.choice(["Hall A", "Hall B", "Gallery 3"]),
+        "price": f"₹{rng.randint(50, 300)}",
+        "ticketsLeft": rng.randint(0, 500),
+        "id": str(i),
+        "price_int": rng.randint(50, 300),
+        # Fields stored on show documents that /shows never returns
+        "description": "An exhibition of works from the permanent collection. " * 8,
+        "pricing": {"groupDiscounts": [[10, 0.1]], "surge": [[0.2, 1.25]]},
+        "startsAt": None,
+    }
+
+
+def wire(docs, fields=None):
+    # BSON batches as the driver would receive them, with or without a projection
+    if fields:
+        docs = [{k: v for k, v in doc.items() if fields.get(k)} for doc in docs]
+    return b"".join(bson.encode(doc) for doc in docs)
+
+
+def before(payload, field):
+    docs = bson.decode_all(payload)
+    content = asyncio.run(serialize_response(field=field, response_content=docs))
+    return JSONResponse(content).body
+
+
+def after(payload):
+    return validated_response(Shows, bson.decode_all(payload)).body
+
+
+def timed(fn, *args):
+    best = float("inf")
+    for _ in range(ROUNDS):
+        started = time.process_time()
+        fn(*args)
+        best = min(best, time.process_time() - started)
+    return best
+
+
+def main():
+    rng = random.Random(1)
+    docs = [make_show(rng, i) for i in range(DOCUMENTS)]
+    field = create_response_field(name="response", type_=List[Shows])
+    full, projected = wire(docs), wire(docs, projection(Shows))
+
+    assert len(before(full, field)) > 0 and len(after(projected)) > 0
+    old, new = timed(before, full, field), timed(after, projected)
+    print(f"{DOCUMENTS} documents, best of {ROUNDS}")
+    print(f"before: {old * 1000:8.1f} ms CPU/request ({len(full) / 1e6:.1f} MB from the wire)")
+    print(f"after:  {new * 1000:8.1f} ms CPU/request ({len(projected) / 1e6:.1f} MB from the wire)")
+    print(f"speedup: {old / new:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+import hashlib
+import json
+import os
+import re
+import time
+
+from database import current_tenant
+
+# Set CAPTURE_FILE to record chat and booking traffic as JSONL for replay.py
+CAPTURE_FILE = os.getenv("CAPTURE_FILE")
+CAPTURE_PATHS = {"/webhook", "/ticket_booking/payment", "/reserve_tickets/"}
+
+_EMAIL = re.compile(r"[\w.+-]+@[\w-]+\.[\w.-]+")
+_PHONE = re.compile(r"\+?\d[\d -]{8,}\d")
+# Session ids also appear inside context names: .../sessions/<id>/contexts/<name>
+_SESSION_PATH = re.compile(r"(/sessions/)([^/]+)")
+
+
+def pseudonym(value: str) -> str:
+    # Stable per value, so the same customer keeps the same identity across a replay
+    return hashlib.sha256(value.lower().encode("utf-8")).hexdigest()[:12]
+
+
+def scrub_text(text: str) -> str:
+    text = _EMAIL.sub(lambda m: f"user-{pseudonym(m.group())}@example.com", text)
+    text = _SESSION_PATH.sub(lambda m: m.group(1) + pseudonym(m.group(2)), text)
+    return _PHONE.sub("0000000000", text)
+
+
+def sanitize(value, key: str = ""):
+    if isinstance(value, dict):
+        return {k: sanitize(v, k) for k, v in value.items()}
+    if isinstance(value, list):
+        return [sanitize(v, key) for v in value]
+    if isinstance(value, str):
+        if key == "session":
+            # Keep the agent path so tenant routing still works, hide the session id
+            prefix, _, session_id = value.rpartition("/")
+            return f"{prefix}/{pseudonym(session_id)}" if prefix else pseudonym(value)
+        return scrub_text(value)
+    return value
+
+
+class TrafficCapture:
+    def __init__(self, path):
+        self.path = path
+        self.file = None
+
+    def wants(self, request) -> bool:
+        return self.path is not None and request.url.path in CAPTURE_PATHS
+
+    def record(self, request, body: bytes, status_code: int, elapsed: float):
+        try:
+            payload = json.loads(body or b"null")
+        except ValueError:
+            return
+        entry = {
+            "ts": time.time() - elapsed,
+            "method": request.method,
+            "path": request.url.path,
+            # The resolved tenant, so host- and agent-routed traffic replays against the same venue
+            "tenant": current_tenant.get(),
+            "intent": getattr(request.state, "intent_name", None),
+            "status": status_code,
+            "duration_ms": round(elapsed * 1000, 3),
+            "body": sanitize(payload),
+        }
+        try:
+            if self.file is None:
+                self.file = open(self.path, "a", encoding="utf-8")
+            self.file.write(json.dumps(entry, ensure_ascii=False) + "\n")
+            self.file.flush()
+        except OSError as e:
+            print(f"Failed to capture request: {e}")
+
+
+traffic_capture = TrafficCapture(CAPTURE_FILE)
@@ -1,4 +1,8 @@
 from motor.motor_asyncio import AsyncIOMotorClient
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import lru_cache
+import json
 import os
 from dotenv import load_dotenv
 
@@ -10,12 +14,68 @@ MONGODB_URI = os.getenv("MONGODB_URI")
 if not MONGODB_URI:
     raise Exception("MONGODB_URI not found in environment variables.")
 
+# One client (and connection pool) is shared by every tenant
 client = AsyncIOMotorClient(MONGODB_URI)
-database = client["Ticketing"]
+
+# Tenants: {"museum-a": {"database": "MuseumA", "hosts": ["a.example.com"], "agents": ["museum-a-agent"]}}
+DEFAULT_TENANT = os.getenv("DEFAULT_TENANT", "Ticketing")
+TENANTS = json.loads(os.getenv("TENANTS", "{}"))
+TENANTS.setdefault(DEFAULT_TENANT, {"database": DEFAULT_TENANT})
+TENANT_CACHE_SIZE = int(os.getenv("TENANT_CACHE_SIZE", "64"))
+
+COLLECTION_NAMES = {
+    "tickets": "tickets",
+    "earnings": "earnings",
+    "profit": "profit",
+    "shows": "shows",
+    "payments": "payments",
+    "faq": "faq",
+    "sessions": "sessions",
+    "seat_claims": "seat_claims",
+}
+
+# Tenant of the request being served, set by the tenant middleware
+current_tenant = ContextVar("current_tenant", default=DEFAULT_TENANT)
+
+
+@contextmanager
+def use_tenant(tenant: str):
+    # Run a block against another tenant's database, e.g. per-tenant setup at startup
+    token = current_tenant.set(tenant)
+    try:
+        yield
+    finally:
+        current_tenant.reset(token)
+
+
+@lru_cache(maxsize=TENANT_CACHE_SIZE)
+def tenant_collections(tenant: str) -> dict:
+    db = client[TENANTS.get(tenant, {}).get("database", tenant)]
+    handles = {name: db[collection] for name, collection in COLLECTION_NAMES.items()}
+    handles["database"] = db
+    return handles
+
+
+class TenantCollection:
+    # Collection handle that resolves to the current tenant's database on every use
+    def __init__(self, name: str):
+        self.name = name
+
+    def __getattr__(self, attr):
+        return getattr(tenant_collections(current_tenant.get())[self.name], attr)
+
+    def __repr__(self):
+        return f"TenantCollection({self.name!r})"
+
+
+database = tenant_collections(DEFAULT_TENANT)["database"]
 
 # Define collections
-tickets_collection = database["tickets"]
-earnings_collection = database["earnings"]
-profit_collection = database["profit"]
-shows_collections = database["shows"]
-payment_collection = database["payments"]
+tickets_collection = TenantCollection("tickets")
+earnings_collection = TenantCollection("earnings")
+profit_collection = TenantCollection("profit")
+shows_collections = TenantCollection("shows")
+payment_collection = TenantCollection("payments")
+faq_collection = TenantCollection("faq")
+sessions_collection = TenantCollection("sessions")
+seat_claims_collection = TenantCollection("seat_claims")
@@ -0,0 +1,141 @@
+import argparse
+import asyncio
+import csv
+import hmac
+import io
+import json
+import os
+import sys
+from datetime import datetime, timedelta
+from typing import AsyncIterator, Optional
+
+import pytz
+from bson import ObjectId
+
+from database import DEFAULT_TENANT, TENANTS, payment_collection, use_tenant
+
+# Fields written to every export row, in column order
+EXPORT_FIELDS = ["id", "createdAt", "eventId", "email", "seatCount", "selectedSeats", "amount"]
+EXPORT_PROJECTION = {"eventId": 1, "email": 1, "seatCount": 1, "selectedSeats": 1, "amount": 1}
+EXPORT_BATCH_SIZE = 2000
+# The HTTP export streams customer emails, so it is only served to callers presenting this
+# token in X-Export-Token; without it exports are CLI-only
+EXPORT_TOKEN = os.getenv("EXPORT_TOKEN")
+
+
+def export_authorized(token: Optional[str]) -> bool:
+    return bool(EXPORT_TOKEN) and token is not None and hmac.compare_digest(token.encode(), EXPORT_TOKEN.encode())
+
+
+def parse_date(value: Optional[str], end: bool = False) -> Optional[datetime]:
+    # Accept plain dates (2024-09-14) or full ISO timestamps; a plain end date covers the whole day
+    if not value:
+        return None
+    parsed = datetime.fromisoformat(value)
+    if end and len(value) <= 10:
+        parsed += timedelta(days=1)
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=pytz.UTC)
+    return parsed
+
+
+def build_payment_filter(event_id: Optional[str] = None,
+                         start: Optional[datetime] = None,
+                         end: Optional[datetime] = None) -> dict:
+    # Payments carry no timestamp field, so the date range is applied to the
+    # ObjectId creation time, which also lets Mongo use the _id index
+    query = {}
+    if event_id:
+        query["eventId"] = event_id
+    id_range = {}
+    if start:
+        id_range["$gte"] = ObjectId.from_datetime(start)
+    if end:
+        id_range["$lt"] = ObjectId.from_datetime(end)
+    if id_range:
+        query["_id"] = id_range
+    return query
+
+
+def payment_row(doc: dict) -> dict:
+    return {
+        "id": str(doc["_id"]),
+        "createdAt": doc["_id"].generation_time.isoformat(),
+        "eventId": doc.get("eventId"),
+        "email": doc.get("email"),
+        "seatCount": doc.get("seatCount"),
+        "selectedSeats": doc.get("selectedSeats", []),
+        "amount": doc.get("amount"),
+    }
+
+
+async def iter_payments(event_id: Optional[str] = None,
+                        start: Optional[datetime] = None,
+                        end: Optional[datetime] = None) -> AsyncIterator[dict]:
+    cursor = payment_collection.find(
+        build_payment_filter(event_id, start, end),
+        EXPORT_PROJECTION,
+    ).sort("_id", 1).batch_size(EXPORT_BATCH_SIZE)
+    async for doc in cursor:
+        yield payment_row(doc)
+
+
+async def stream_csv(rows: AsyncIterator[dict]) -> AsyncIterator[str]:
+    # Reuse one buffer and flush it every row so only a single line is held in memory
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=EXPORT_FIELDS)
+    writer.writeheader()
+    async for row in rows:
+        row["selectedSeats"] = " ".join(str(seat) for seat in row["selectedSeats"])
+        writer.writerow(row)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate(0)
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+async def stream_ndjson(rows: AsyncIterator[dict]) -> AsyncIterator[str]:
+    async for row in rows:
+        yield json.dumps(row, ensure_ascii=False) + "\n"
+
+
+EXPORT_FORMATS = {
+    "csv": (stream_csv, "text/csv"),
+    "ndjson": (stream_ndjson, "application/x-ndjson"),
+}
+
+
+async def export_payments(out, fmt: str = "csv", event_id: Optional[str] = None,
+                          start: Optional[datetime] = None, end: Optional[datetime] = None,
+                          tenant: str = DEFAULT_TENANT):
+    formatter, _ = EXPORT_FORMATS[fmt]
+    # payment_collection follows the current tenant, which is only set per request in the app
+    with use_tenant(tenant):
+        async for chunk in formatter(iter_payments(event_id, start, end)):
+            out.write(chunk)
+    out.flush()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export payments as CSV or NDJSON")
+    parser.add_argument("--event", dest="event_id", help="only export payments for this eventId")
+    parser.add_argument("--from", dest="start", help="start date (inclusive), e.g. 2024-09-01")
+    parser.add_argument("--to", dest="end", help="end date (inclusive), e.g. 2024-09-30")
+    parser.add_argument("--format", dest="fmt", choices=sorted(EXPORT_FORMATS), default="csv")
+    parser.add_argument("--output", "-o", help="output file (defaults to stdout)")
+    parser.add_argument("--tenant", choices=sorted(TENANTS), default=DEFAULT_TENANT,
+                        help=f"tenant whose payments are exported (defaults to {DEFAULT_TENANT})")
+    args = parser.parse_args(argv)
+
+    start = parse_date(args.start)
+    end = parse_date(args.end, end=True)
+    if args.output:
+        with open(args.output, "w", newline="", encoding="utf-8") as out:
+            asyncio.run(export_payments(out, args.fmt, args.event_id, start, end, args.tenant))
+    else:
+        asyncio.run(export_payments(sys.stdout, args.fmt, args.event_id, start, end, args.tenant))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,217 @@
+import heapq
+import json
+import math
+import os
+import time
+import unicodedata
+from typing import Dict, List, Optional, Tuple
+
+FAQ_FILE = os.getenv("FAQ_FILE", os.path.join(os.path.dirname(os.path.abspath(__file__)), "faq.json"))
+FAQ_RELOAD_SECONDS = float(os.getenv("FAQ_RELOAD_SECONDS", "30"))
+FAQ_MIN_SCORE = 0.45
+# Grams shared by more aliases than this are too common to pick candidates with
+FAQ_COMMON_GRAM = 32
+FAQ_SHORTLIST = 8
+# Trigram similarity at which a query word counts as a (misspelt or inflected) alias word
+FAQ_WORD_MATCH = 0.5
+FAQ_FALLBACK = {
+    "en": "I'm sorry, I don't have information on that topic.",
+    "hi": "क्षमा करें, मेरे पास इस विषय पर जानकारी नहीं है।",
+    "mr": "क्षमस्व, माझ्याकडे या विषयाची माहिती नाही.",
+    "bn": "দুঃখিত, এই বিষয়ে আমার কাছে কোনো তথ্য নেই।",
+    "ta": "மன்னிக்கவும், இந்த தலைப்பில் என்னிடம் தகவல் இல்லை.",
+    "te": "క్షమించండి, ఈ అంశంపై నా వద్ద సమాచారం లేదు.",
+}
+
+# Punctuation, symbols and separators become spaces; combining marks used by Indic scripts are kept
+_SEPARATOR_CATEGORIES = ("P", "S", "Z")
+
+
+def normalize(text: str) -> str:
+    text = unicodedata.normalize("NFKC", text).casefold()
+    return " ".join("".join(" " if unicodedata.category(c)[0] in _SEPARATOR_CATEGORIES else c for c in text).split())
+
+
+def trigrams(word: str) -> frozenset:
+    padded = f" {word} "
+    return frozenset(padded[i:i + 3] for i in range(len(padded) - 2))
+
+
+def grams(text: str) -> set:
+    # Word tokens plus padded character trigrams, so typos and inflections still overlap
+    result = set()
+    for word in text.split():
+        result.add(word)
+        result.update(trigrams(word))
+    return result
+
+
+class FaqEngine:
+    def __init__(self, entries: List[dict], min_score: float = FAQ_MIN_SCORE):
+        self.min_score = min_score
+        self.answers: List[Dict[str, str]] = []
+        # Exact normalized question -> (entry, language)
+        self.exact: Dict[str, Tuple[int, str]] = {}
+        # Alias metadata: (entry, language, words); postings map gram -> alias ids
+        self.aliases: List[Tuple[int, str, Tuple[str, ...]]] = []
+        self.postings: Dict[str, List[int]] = {}
+        # Entries each word appears in, and the trigrams of every indexed word
+        self.word_entries: Dict[str, set] = {}
+        self.word_trigrams: Dict[str, frozenset] = {}
+        self.alias_sizes: List[int] = []
+        # Word weights, computed on first use; adding entries changes them
+        self.weights: Dict[str, float] = {}
+        for entry in entries:
+            self.add(entry)
+
+    def add(self, entry: dict):
+        entry_id = len(self.answers)
+        self.answers.append(entry["answers"])
+        self.weights.clear()
+        questions = dict(entry.get("questions", {}))
+        questions.setdefault("en", [])
+        if entry.get("key"):
+            questions["en"] = [entry["key"], *questions["en"]]
+        for lang, phrases in questions.items():
+            for phrase in phrases:
+                text = normalize(phrase)
+                if not text:
+                    continue
+                self.exact.setdefault(text, (entry_id, lang))
+                words = tuple(dict.fromkeys(text.split()))
+                alias_id = len(self.aliases)
+                self.aliases.append((entry_id, lang, words))
+                alias_grams = set(words)
+                for word in words:
+                    self.word_entries.setdefault(word, set()).add(entry_id)
+                    word_trigrams = self.word_trigrams.get(word)
+                    if word_trigrams is None:
+                        word_trigrams = self.word_trigrams[word] = trigrams(word)
+                    alias_grams.update(word_trigrams)
+                self.alias_sizes.append(len(alias_grams))
+                for gram in alias_grams:
+                    self.postings.setdefault(gram, []).append(alias_id)
+
+    def word_weight(self, word: str) -> float:
+        # Inverse document frequency over entries: words many entries share ("the", "museum")
+        # say little about which entry was meant. Words no entry has can't point at one
+        # either, so they weigh as much as a word every entry has.
+        weight = self.weights.get(word)
+        if weight is None:
+            if word not in self.word_entries:
+                return math.log(2)
+            weight = self.weights[word] = math.log(1 + len(self.answers) / len(self.word_entries[word]))
+        return weight
+
+    def score(self, query_words: List[Tuple[str, frozenset, float]], alias_words: Tuple[str, ...]) -> float:
+        # Weighted Dice over words: each query word pairs with its most similar alias word and
+        # then weighs as much as that word, so a typo costs its similarity and nothing more
+        matched = [0.0] * len(alias_words)
+        query_weight = 0.0
+        for word, word_trigrams, weight in query_words:
+            best, best_index = 0.0, None
+            for i, alias_word in enumerate(alias_words):
+                if word == alias_word:
+                    best, best_index = 1.0, i
+                    break
+                alias_trigrams = self.word_trigrams[alias_word]
+                similarity = 2 * len(word_trigrams & alias_trigrams) / (len(word_trigrams) + len(alias_trigrams))
+                if similarity > best:
+                    best, best_index = similarity, i
+            if best >= FAQ_WORD_MATCH:
+                matched[best_index] = max(matched[best_index], best)
+                weight = self.word_weight(alias_words[best_index])
+            query_weight += weight
+        alias_weights = [self.word_weight(word) for word in alias_words]
+        shared = sum(weight * similarity for weight, similarity in zip(alias_weights, matched))
+        return 2 * shared / (query_weight + sum(alias_weights))
+
+    def match(self, query: str) -> Optional[Tuple[int, str, float]]:
+        text = normalize(query)
+        if not text:
+            return None
+        if text in self.exact:
+            entry_id, lang = self.exact[text]
+            return entry_id, lang, 1.0
+        query_grams = grams(text)
+        # Shortlist aliases by the share of rare grams they have in common with the query (so
+        # short aliases aren't crowded out by long ones), then score the shortlist word by word
+        overlap: Dict[int, int] = {}
+        common = []
+        for gram in query_grams:
+            posting = self.postings.get(gram)
+            if posting is None:
+                continue
+            if len(posting) > FAQ_COMMON_GRAM:
+                common.append(posting)
+                continue
+            for alias_id in posting:
+                overlap[alias_id] = overlap.get(alias_id, 0) + 1
+        if not overlap:
+            for posting in common:
+                for alias_id in posting:
+                    overlap[alias_id] = overlap.get(alias_id, 0) + 1
+        sizes = self.alias_sizes
+        shortlist = heapq.nlargest(FAQ_SHORTLIST, overlap, key=lambda alias_id: overlap[alias_id] / sizes[alias_id])
+        best_alias, best_score = None, 0.0
+        query_words = [(word, trigrams(word), self.word_weight(word)) for word in dict.fromkeys(text.split())]
+        for alias_id in shortlist:
+            score = self.score(query_words, self.aliases[alias_id][2])
+            if score > best_score:
+                best_alias, best_score = alias_id, score
+        if best_alias is None or best_score < self.min_score:
+            return None
+        entry_id, lang, _ = self.aliases[best_alias]
+        return entry_id, lang, best_score
+
+    def answer(self, query: str, lang: Optional[str] = None) -> str:
+        # Reply in the requested language, else in the language the question was asked in
+        found = self.match(query)
+        if found is None:
+            return FAQ_FALLBACK.get(lang, FAQ_FALLBACK["en"])
+        entry_id, matched_lang, _ = found
+        answers = self.answers[entry_id]
+        return answers.get(lang) or answers.get(matched_lang) or answers.get("en") or next(iter(answers.values()))
+
+
+class FaqSource:
+    # Keeps an engine built from the FAQ file and rebuilds it when the file changes
+    def __init__(self, path: str = FAQ_FILE, reload_seconds: float = FAQ_RELOAD_SECONDS):
+        self.path = path
+        self.reload_seconds = reload_seconds
+        self.version = None
+        self.checked = None
+        self.engine = FaqEngine([])
+
+    async def get(self) -> FaqEngine:
+        now = time.monotonic()
+        if self.checked is None or now - self.checked >= self.reload_seconds:
+            self.checked = now
+            try:
+                await self.refresh()
+            except Exception as e:
+                print(f"FAQ reload failed, keeping previous index: {e}")
+        return self.engine
+
+    async def refresh(self):
+        version = os.stat(self.path).st_mtime
+        if version != self.version:
+            with open(self.path, encoding="utf-8") as f:
+                self.engine = FaqEngine(json.load(f))
+            self.version = version
+
+
+class CollectionFaqSource(FaqSource):
+    # Same as FaqSource, but entries live in a collection; edits must bump "updatedAt"
+    def __init__(self, collection, reload_seconds: float = FAQ_RELOAD_SECONDS):
+        super().__init__(reload_seconds=reload_seconds)
+        self.collection = collection
+
+    async def refresh(self):
+        latest = await self.collection.find_one({}, {"updatedAt": 1}, sort=[("updatedAt", -1)])
+        count = await self.collection.count_documents({})
+        version = (count, latest.get("updatedAt") if latest else None)
+        if version != self.version:
+            entries = await self.collection.find({}, {"_id": 0, "key": 1, "questions": 1, "answers": 1}).to_list(None)
+            self.engine = FaqEngine(entries)
+            self.version = version
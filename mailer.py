@@ -0,0 +1,296 @@
+import asyncio
+import base64
+import hashlib
+import html
+import os
+import smtplib
+import time
+from collections import OrderedDict
+from functools import lru_cache
+from email.header import Header
+from string import Template
+from typing import List, NamedTuple, Optional
+
+# Booking confirmations: per-locale templates compiled once, one email per booking, and
+# delivery in batches over a single SMTP connection (or to .eml files with MAIL_TRANSPORT=file).
+# With MAIL_FLUSH_SECONDS=0 (the default) the caller flushes from the request's background
+# task, so nothing is left queued when a serverless instance is frozen after the response;
+# a positive value batches confirmations across requests on long-running servers.
+SENDER_EMAIL = os.getenv("SMTP_USER", "code.a.cola.01@gmail.com")
+SENDER_PASSWORD = os.getenv("SMTP_PASSWORD", "qamm sgmn dgwu frgz")
+SMTP_HOST = os.getenv("SMTP_HOST", "smtp.gmail.com")
+SMTP_PORT = int(os.getenv("SMTP_PORT", "465"))
+MAIL_TRANSPORT = os.getenv("MAIL_TRANSPORT", "smtp")
+MAIL_DIR = os.getenv("MAIL_DIR", "outbox")
+MAIL_BATCH_SIZE = 200
+MAIL_FLUSH_SECONDS = float(os.getenv("MAIL_FLUSH_SECONDS", "0"))
+# A payment is confirmed once even if its confirmation is enqueued again
+DEDUP_SECONDS = 3600
+DEDUP_MAX = 100000
+SITE_LINK = "https://ticket-bot-one.vercel.app"
+
+TEMPLATES = {
+    "en": {
+        "subject": "Ticket Booking Confirmation for $title",
+        "greeting": "Dear Customer,",
+        "intro": "Thank you for booking tickets for the show: $title.",
+        "details": "Here are the details of your booking:",
+        "show": "Show Name", "date": "Date", "time": "Time", "tickets": "Tickets Booked", "seats": "Seats",
+        "outro": "Your ticket has been successfully booked, and we look forward to seeing you at the event.",
+        "contact": "If you have any questions, feel free to contact us.",
+        "closing": "Best regards,",
+    },
+    "hi": {
+        "subject": "$title के लिए टिकट बुकिंग की पुष्टि",
+        "greeting": "प्रिय ग्राहक,",
+        "intro": "शो $title के लिए टिकट बुक करने के लिए धन्यवाद।",
+        "details": "आपकी बुकिंग का विवरण:",
+        "show": "शो का नाम", "date": "तारीख", "time": "समय", "tickets": "बुक किए गए टिकट", "seats": "सीटें",
+        "outro": "आपका टिकट सफलतापूर्वक बुक हो गया है, हम कार्यक्रम में आपका इंतज़ार करेंगे।",
+        "contact": "कोई प्रश्न हो तो बेझिझक हमसे संपर्क करें।",
+        "closing": "शुभकामनाओं सहित,",
+    },
+    "mr": {
+        "subject": "$title साठी तिकीट बुकिंगची पुष्टी",
+        "greeting": "प्रिय ग्राहक,",
+        "intro": "$title या शोसाठी तिकिटे बुक केल्याबद्दल धन्यवाद.",
+        "details": "तुमच्या बुकिंगचा तपशील:",
+        "show": "शोचे नाव", "date": "दिनांक", "time": "वेळ", "tickets": "बुक केलेली तिकिटे", "seats": "आसने",
+        "outro": "तुमचे तिकीट यशस्वीरित्या बुक झाले आहे, कार्यक्रमात तुमची वाट पाहत आहोत.",
+        "contact": "काही प्रश्न असल्यास आमच्याशी संपर्क साधा.",
+        "closing": "शुभेच्छांसह,",
+    },
+    "bn": {
+        "subject": "$title-এর টিকিট বুকিং নিশ্চিতকরণ",
+        "greeting": "প্রিয় গ্রাহক,",
+        "intro": "$title শো-এর টিকিট বুক করার জন্য ধন্যবাদ।",
+        "details": "আপনার বুকিংয়ের বিবরণ:",
+        "show": "শো-এর নাম", "date": "তারিখ", "time": "সময়", "tickets": "বুক করা টিকিট", "seats": "আসন",
+        "outro": "আপনার টিকিট সফলভাবে বুক হয়েছে, অনুষ্ঠানে আপনার অপেক্ষায় রইলাম।",
+        "contact": "কোনো প্রশ্ন থাকলে নির্দ্বিধায় যোগাযোগ করুন।",
+        "closing": "শুভেচ্ছা সহ,",
+    },
+    "ta": {
+        "subject": "$title க்கான டிக்கெட் முன்பதிவு உறுதிப்படுத்தல்",
+        "greeting": "அன்புள்ள வாடிக்கையாளரே,",
+        "intro": "$title நிகழ்ச்சிக்கு டிக்கெட் முன்பதிவு செய்ததற்கு நன்றி.",
+        "details": "உங்கள் முன்பதிவு விவரங்கள்:",
+        "show": "நிகழ்ச்சி", "date": "தேதி", "time": "நேரம்", "tickets": "முன்பதிவு செய்த டிக்கெட்டுகள்", "seats": "இருக்கைகள்",
+        "outro": "உங்கள் டிக்கெட் வெற்றிகரமாக முன்பதிவு செய்யப்பட்டது, நிகழ்ச்சியில் உங்களை சந்திக்க ஆவலுடன் உள்ளோம்.",
+        "contact": "ஏதேனும் கேள்விகள் இருந்தால் எங்களைத் தொடர்பு கொள்ளுங்கள்.",
+        "closing": "அன்புடன்,",
+    },
+    "te": {
+        "subject": "$title కోసం టికెట్ బుకింగ్ నిర్ధారణ",
+        "greeting": "ప్రియమైన కస్టమర్,",
+        "intro": "$title ప్రదర్శనకు టికెట్లు బుక్ చేసినందుకు ధన్యవాదాలు.",
+        "details": "మీ బుకింగ్ వివరాలు:",
+        "show": "ప్రదర్శన పేరు", "date": "తేదీ", "time": "సమయం", "tickets": "బుక్ చేసిన టికెట్లు", "seats": "సీట్లు",
+        "outro": "మీ టికెట్ విజయవంతంగా బుక్ అయింది, కార్యక్రమంలో మిమ్మల్ని కలవడానికి ఎదురుచూస్తున్నాం.",
+        "contact": "ఏవైనా ప్రశ్నలు ఉంటే మమ్మల్ని సంప్రదించండి.",
+        "closing": "శుభాకాంక్షలతో,",
+    },
+}
+
+TEXT_LAYOUT = """$greeting
+
+$intro
+
+$details
+- $show_label: $title
+- $date_label: $date
+- $time_label: $time
+- $tickets_label: $tickets$seats_line
+
+$outro
+
+$contact
+- Link : "$link"
+
+$closing
+Quicktix
+"""
+
+HTML_LAYOUT = """<html><body>
+<p>$greeting</p>
+<p>$intro</p>
+<p>$details</p>
+<ul>
+<li><b>$show_label:</b> $title</li>
+<li><b>$date_label:</b> $date</li>
+<li><b>$time_label:</b> $time</li>
+<li><b>$tickets_label:</b> $tickets</li>$seats_line
+</ul>
+<p>$outro</p>
+<p>$contact <a href="$link">$link</a></p>
+<p>$closing<br>Quicktix</p>
+</body></html>
+"""
+
+
+class CompiledTemplate:
+    # The locale's labels are substituted into the layouts once; only booking fields remain
+    def __init__(self, strings: dict):
+        labels = {
+            "greeting": strings["greeting"], "details": strings["details"],
+            "show_label": strings["show"], "date_label": strings["date"], "time_label": strings["time"],
+            "tickets_label": strings["tickets"], "outro": strings["outro"], "contact": strings["contact"],
+            "closing": strings["closing"], "link": SITE_LINK,
+        }
+        escaped = {key: html.escape(value) for key, value in labels.items()}
+        self.subject = Template(strings["subject"])
+        self.text = Template(Template(TEXT_LAYOUT).safe_substitute(labels, intro=strings["intro"]))
+        self.html = Template(Template(HTML_LAYOUT).safe_substitute(escaped, intro=html.escape(strings["intro"])))
+        self.seats_label = strings["seats"]
+
+    def render(self, event: dict, tickets, seats=None):
+        values = {
+            "title": str(event.get("title", "")),
+            "date": str(event.get("date", "")),
+            "time": str(event.get("time", "")),
+            "tickets": str(tickets),
+        }
+        seat_list = ", ".join(map(str, seats)) if seats else ""
+        text_values = dict(values, seats_line=f"\n- {self.seats_label}: {seat_list}" if seats else "")
+        html_values = {key: html.escape(value) for key, value in values.items()}
+        html_values["seats_line"] = f"\n<li><b>{html.escape(self.seats_label)}:</b> {seat_list}</li>" if seats else ""
+        return (self.subject.substitute(text_values), self.text.substitute(text_values),
+                self.html.substitute(html_values))
+
+
+COMPILED_TEMPLATES = {locale: CompiledTemplate(strings) for locale, strings in TEMPLATES.items()}
+
+
+class Confirmation(NamedTuple):
+    to: str
+    data: bytes
+
+
+# Base64 never contains "-", so the boundary cannot occur inside a part
+BOUNDARY = "quicktix-confirmation"
+ENVELOPE = Template(
+    "Subject: $subject\r\nFrom: $sender\r\nTo: $to\r\nMIME-Version: 1.0\r\n"
+    f'Content-Type: multipart/alternative; boundary="{BOUNDARY}"\r\n\r\n'
+    f"--{BOUNDARY}\r\nContent-Type: text/plain; charset=utf-8\r\nContent-Transfer-Encoding: base64\r\n\r\n"
+    "$text\r\n"
+    f"--{BOUNDARY}\r\nContent-Type: text/html; charset=utf-8\r\nContent-Transfer-Encoding: base64\r\n\r\n"
+    "$html\r\n"
+    f"--{BOUNDARY}--\r\n"
+)
+
+
+@lru_cache(maxsize=4096)
+def encode_subject(subject: str) -> str:
+    # Subjects repeat for every booking of an event
+    return Header(subject, "utf-8").encode(linesep="\r\n")
+
+
+def encode_body(body: str) -> str:
+    return base64.encodebytes(body.encode("utf-8")).decode("ascii").replace("\n", "\r\n").rstrip()
+
+
+def render_confirmation(email_address: str, event: dict, tickets, seats=None, locale: Optional[str] = None) -> Confirmation:
+    # The MIME message is assembled from the precompiled envelope; building it through
+    # email.message.EmailMessage costs a few milliseconds per email
+    if "\r" in email_address or "\n" in email_address:
+        raise ValueError("Invalid email address")
+    template = COMPILED_TEMPLATES.get(locale) or COMPILED_TEMPLATES["en"]
+    subject, text, html_body = template.render(event, tickets, seats)
+    data = ENVELOPE.substitute(
+        subject=encode_subject(subject),
+        sender=SENDER_EMAIL,
+        to=email_address,
+        text=encode_body(text),
+        html=encode_body(html_body),
+    )
+    return Confirmation(email_address, data.encode("ascii"))
+
+
+def booking_key(*parts) -> str:
+    return hashlib.sha1("|".join(str(part).lower() for part in parts).encode("utf-8")).hexdigest()
+
+
+class SMTPTransport:
+    def __init__(self, host: str = SMTP_HOST, port: int = SMTP_PORT,
+                 user: str = SENDER_EMAIL, password: str = SENDER_PASSWORD):
+        self.host, self.port, self.user, self.password = host, port, user, password
+
+    def send_batch(self, messages: List[Confirmation]) -> int:
+        # One login for the whole batch; a failed recipient doesn't stop the rest
+        sent = 0
+        with smtplib.SMTP_SSL(self.host, self.port) as smtp:
+            smtp.login(self.user, self.password)
+            for msg in messages:
+                try:
+                    smtp.sendmail(self.user, [msg.to], msg.data)
+                    sent += 1
+                except smtplib.SMTPException as e:
+                    print(f"Failed to send email to {msg.to}: {e}")
+        return sent
+
+
+class FileTransport:
+    # Writes each message as an .eml file; stands in for SMTP locally and in tests
+    def __init__(self, directory: str = MAIL_DIR):
+        self.directory = directory
+        self.count = 0
+
+    def send_batch(self, messages: List[Confirmation]) -> int:
+        os.makedirs(self.directory, exist_ok=True)
+        for msg in messages:
+            self.count += 1
+            path = os.path.join(self.directory, f"{time.time_ns()}-{os.getpid()}-{self.count}.eml")
+            with open(path, "wb") as f:
+                f.write(msg.data)
+        return len(messages)
+
+
+class ConfirmationMailer:
+    def __init__(self, transport, batch_size: int = MAIL_BATCH_SIZE, flush_seconds: float = MAIL_FLUSH_SECONDS):
+        self.transport = transport
+        self.batch_size = batch_size
+        self.flush_seconds = flush_seconds
+        self.pending: List[Confirmation] = []
+        self.seen = OrderedDict()
+        self.task = None
+
+    def first_time(self, key: str) -> bool:
+        now = time.monotonic()
+        while self.seen and next(iter(self.seen.values())) < now - DEDUP_SECONDS:
+            self.seen.popitem(last=False)
+        if key in self.seen:
+            return False
+        self.seen[key] = now
+        if len(self.seen) > DEDUP_MAX:
+            self.seen.popitem(last=False)
+        return True
+
+    @property
+    def batching(self) -> bool:
+        return self.flush_seconds > 0
+
+    def enqueue(self, key: str, email_address: str, event: dict, tickets, seats=None, locale=None) -> bool:
+        # False when this booking was already confirmed
+        if not self.first_time(key):
+            return False
+        self.pending.append(render_confirmation(email_address, event, tickets, seats, locale))
+        if self.batching and (self.task is None or self.task.done()):
+            self.task = asyncio.get_running_loop().create_task(self.flush_later())
+        return True
+
+    async def flush_later(self):
+        # Let confirmations from concurrent requests pile up, then send them together
+        if len(self.pending) < self.batch_size:
+            await asyncio.sleep(self.flush_seconds)
+        await self.flush()
+
+    async def flush(self):
+        while self.pending:
+            batch, self.pending = self.pending[:self.batch_size], self.pending[self.batch_size:]
+            try:
+                await asyncio.to_thread(self.transport.send_batch, batch)
+            except Exception as e:
+                print(f"Failed to send {len(batch)} confirmation emails: {e}")
+
+
+mailer = ConfirmationMailer(FileTransport() if MAIL_TRANSPORT == "file" else SMTPTransport())
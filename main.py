@@ -1,13 +1,32 @@
 from bson import ObjectId
+from pymongo import ReturnDocument
 from datetime import datetime
+import asyncio
 import pytz
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi import FastAPI, HTTPException, Query, Request, BackgroundTasks
-import smtplib
-from email.message import EmailMessage
+from fastapi import FastAPI, Header, HTTPException, Query, Request, Response, BackgroundTasks
+from fastapi.responses import JSONResponse, StreamingResponse
+import inspect
+import os
+import time
 from typing import List
-from database import tickets_collection, earnings_collection, profit_collection, shows_collections, payment_collection
-from model import Earnings, Tickets, ResolutionTime, Shows, PaymentDetails, TicketRequest, DialogflowRequest
+from database import tickets_collection, earnings_collection, profit_collection, shows_collections, payment_collection, current_tenant, faq_collection
+from model import Earnings, Tickets, ResolutionTime, Shows, ShowSlot, PaymentDetails, TicketRequest, DialogflowRequest
+from export import EXPORT_FORMATS, export_authorized, iter_payments, parse_date
+from ratelimit import check_request, ensure_rate_limit_indexes, load_monitor
+from tenants import resolve_tenant, tenant_cache
+from faq_engine import FaqSource, CollectionFaqSource
+from profiler import should_profile, profile_request
+from capture import traffic_capture
+from sessions import session_store
+from pricing import get_price_book
+from resilience import DATABASE_UNAVAILABLE, OPERATION_TIMEOUT_MS, guarded, snapshots
+from shared_catalog import shared_catalog
+from responses import projection, validated_response
+from schedule import SCHEDULE_PROJECTION, parse_query_date, prepare_schedules, refresh_schedule, search_query
+from seating import SEAT_HOLD_SECONDS, allocate_seats, claim_seats, ensure_seat_indexes, hold_seats, release_seats, take_hold
+from mailer import booking_key, mailer
+from menus import ENTRY_EVENT_ID, DEFAULT_PRICES, event_id_for, render_greeting, render_ticket_menu
 
 # from insert import insert_initial_data
 # FastAPI app setup
@@ -22,51 +41,74 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-async def send_email(email_address: str, event: dict, ticket):
-    # Sender email and app-specific password
-    sender_email = "code.a.cola.01@gmail.com"
-    email_password = "qamm sgmn dgwu frgz"
+async def send_email(email_address: str, event: dict, ticket, payment_id, seats=None, locale=None):
+    # Runs as the payment's background task; unless batching is on, the email goes out before
+    # the task ends. Only payments are confirmed, once each: a chat reservation isn't paid yet.
+    key = booking_key(current_tenant.get(), "payment", payment_id)
+    if not mailer.enqueue(key, email_address, event, ticket, seats, locale):
+        return "Email already sent for this booking"
+    if not mailer.batching:
+        await mailer.flush()
+    return "Email queued"
 
-    # Create the email body
-    msg = EmailMessage()
-    msg['Subject'] = f"Ticket Booking Confirmation for {event['title']}"
-    msg['From'] = sender_email
-    msg['To'] = email_address
-    msg.set_content(
-        f"""  
-    Dear Customer,
 
-    Thank you for booking tickets for the show: {event['title']}.
+# FAQ entries come from faq.json by default, or from the tenant's "faq" collection
+FAQ_SOURCE = os.getenv("FAQ_SOURCE", "file")
 
-    Here are the details of your booking:
-    - Show Name: {event['title']}
-    - Date: {event['date']}
-    - Time: {event['time']}
-    - Tickets Booked: {ticket}
 
-    Your ticket has been successfully booked, and we look forward to seeing you at the event.
+def faq_source():
+    cache = tenant_cache("faq")
+    if "source" not in cache:
+        cache["source"] = CollectionFaqSource(faq_collection) if FAQ_SOURCE == "mongo" else FaqSource()
+    return cache["source"]
 
-    If you have any questions, feel free to contact us.
-    - Link : "https://ticket-bot-one.vercel.app"
 
-    Best regards,
-    Quicktix
-    """
-    )
+async def prepare_database():
+    for setup in (ensure_rate_limit_indexes, session_store.ensure_indexes, prepare_schedules, ensure_seat_indexes):
+        try:
+            await setup()
+        except Exception as e:
+            print(f"Database setup failed ({setup.__name__}): {e}")
+
+
+@app.on_event("startup")
+async def start_load_monitor():
+    load_monitor.start()
+    # Index creation and the schedule backfill need Mongo; they run in the background so the
+    # app still starts, and serves snapshots, while the database is unreachable
+    app.state.database_setup = asyncio.create_task(prepare_database())
+    # Build the FAQ index up front so the first question doesn't pay for it
+    await faq_source().get()
+
+
+@app.on_event("shutdown")
+async def flush_mail():
+    await mailer.flush()
+
 
-    try:
-        # Send email
-        with smtplib.SMTP_SSL('smtp.gmail.com', 465) as smtp:
-            smtp.login(sender_email, email_password)
-            smtp.send_message(msg)
-        return "Email successfully sent"
-    except Exception as e:
-        return f"Failed to send email: {str(e)}"
-    
 # Earnings Model and Collection
 @app.middleware("http")
 async def custom_middleware(request, call_next):
-    response = await call_next(request)
+    # Route the request to its venue's database before anything touches Mongo
+    current_tenant.set(await resolve_tenant(request))
+    # Token-bucket limits per client and load shedding for the chat and payment endpoints
+    rejection = await check_request(request)
+    if rejection:
+        status_code, detail, retry_after = rejection
+        headers = {"Retry-After": str(retry_after)} if retry_after else None
+        return JSONResponse(status_code=status_code, content={"detail": detail}, headers=headers)
+    # Record sanitized chat/booking traffic for replay when CAPTURE_FILE is set
+    capturing = traffic_capture.wants(request)
+    if capturing:
+        body = await request.body()
+        started = time.perf_counter()
+    # Sampled requests run under cProfile; everything else pays a header lookup
+    if should_profile(request):
+        response = await profile_request(request, call_next)
+    else:
+        response = await call_next(request)
+    if capturing:
+        traffic_capture.record(request, body, response.status_code, time.perf_counter() - started)
     return response
 
 
@@ -75,17 +117,31 @@ def home():
     return {"message": "Hello World"}
 
 
+def stale_headers(saved_at: float) -> dict:
+    return {
+        "X-Data-Stale": "true",
+        "X-Snapshot-Time": datetime.fromtimestamp(saved_at, pytz.UTC).isoformat(),
+    }
+
+
+def snapshot_event(event_id: str):
+    snapshot = snapshots.load("shows")
+    if snapshot is None:
+        return None, None
+    shows, saved_at = snapshot
+    return next((show for show in shows if show.get("id") == event_id), None), saved_at
+
+
 # Fetch earnings data dynamically from MongoDB
 @app.get("/earning", response_model=List[Earnings])
 async def get_earning():
     try:
-        earnings = await earnings_collection.find().to_list(100)
+        earnings = await guarded("earnings", lambda: earnings_collection.find({}, projection(Earnings)).max_time_ms(OPERATION_TIMEOUT_MS).to_list(100))
         if not earnings:
             raise HTTPException(status_code=404, detail="No earnings data found.")
-        # Ensure we remove '_id' from each document and match the data model structure
-        for earning in earnings:
-            earning.pop("_id", None)  # Remove MongoDB _id field if present
-        return earnings
+        return validated_response(Earnings, earnings)
+    except DATABASE_UNAVAILABLE:
+        raise HTTPException(status_code=503, detail="Database temporarily unavailable.")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"An error occurred: {str(e)}")
 
@@ -94,10 +150,12 @@ async def get_earning():
 @app.get("/tickets-analytics", response_model=List[Tickets])
 async def get_ticket_analytics():
     try:
-        tickets = await tickets_collection.find().to_list(100)
+        tickets = await guarded("tickets", lambda: tickets_collection.find({}, projection(Tickets)).max_time_ms(OPERATION_TIMEOUT_MS).to_list(100))
         if not tickets:
             raise HTTPException(status_code=404, detail="No ticket analytics found.")
-        return tickets
+        return validated_response(Tickets, tickets)
+    except DATABASE_UNAVAILABLE:
+        raise HTTPException(status_code=503, detail="Database temporarily unavailable.")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"An error occurred: {str(e)}")
 
@@ -106,29 +164,100 @@ async def get_ticket_analytics():
 @app.get("/profit", response_model=List[ResolutionTime])
 async def get_profits():
     try:
-        profit = await profit_collection.find().to_list(100)
+        profit = await guarded("profit", lambda: profit_collection.find({}, projection(ResolutionTime)).max_time_ms(OPERATION_TIMEOUT_MS).to_list(100))
         if not profit:
             raise HTTPException(status_code=404, detail="No resolution time data found.")
-        return profit
+        return validated_response(ResolutionTime, profit)
+    except DATABASE_UNAVAILABLE:
+        raise HTTPException(status_code=503, detail="Database temporarily unavailable.")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"An error occurred: {str(e)}")
 
 
+# The shows snapshot also keeps pricing rules, so the price book can be rebuilt from it
+SHOWS_PROJECTION = {**projection(Shows), "pricing": 1}
+
+
 # Fetch show name and time data from MongoDB
 @app.get("/shows", response_model=List[Shows])
 async def get_shows():
+    # Multi-worker mode: hand out the pre-validated catalog straight from shared memory
+    view = shared_catalog.current() if shared_catalog else None
+    if view is not None:
+        body = view.raw(current_tenant.get(), "shows")
+        if body is not None:
+            return Response(content=body, media_type="application/json")
     try:
-        shows = await shows_collections.find().to_list(100)
-        if not shows:
-            raise HTTPException(status_code=404, detail="No resolution time data found.")
-        return shows
+        shows = await guarded("shows", lambda: shows_collections.find({}, SHOWS_PROJECTION).max_time_ms(OPERATION_TIMEOUT_MS).to_list(100))
+    except Exception as e:
+        # Serve the last good catalog, marked stale, while the database is unreachable
+        snapshot = snapshots.load("shows")
+        if snapshot is None:
+            status_code = 503 if isinstance(e, DATABASE_UNAVAILABLE) else 500
+            raise HTTPException(status_code=status_code, detail=f"An error occurred: {str(e)}")
+        shows, saved_at = snapshot
+        return validated_response(Shows, shows, headers=stale_headers(saved_at))
+    if not shows:
+        raise HTTPException(status_code=404, detail="No resolution time data found.")
+    try:
+        body = validated_response(Shows, shows)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"An error occurred: {str(e)}")
+    snapshots.save("shows", shows)
+    return body
+
+
+# Upcoming shows by date range, location and availability, served from the schedule index
+@app.get("/shows/search", response_model=List[ShowSlot])
+async def search_shows(
+    start: str = Query(None, alias="from"),
+    end: str = Query(None, alias="to"),
+    location: str = Query(None),
+    min_tickets: int = Query(None, ge=1),
+    limit: int = Query(50, ge=1, le=500),
+):
+    try:
+        start_at = parse_query_date(start) if start else datetime.now(pytz.UTC)
+        end_at = parse_query_date(end, end=True)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid date format provided.")
+    await refresh_schedule()
+    try:
+        return await guarded("shows", lambda: shows_collections.find(
+            search_query(start_at, end_at, location, min_tickets), SCHEDULE_PROJECTION
+        ).sort("startsAt", 1).limit(limit).max_time_ms(OPERATION_TIMEOUT_MS).to_list(limit))
+    except DATABASE_UNAVAILABLE:
+        raise HTTPException(status_code=503, detail="Database temporarily unavailable.")
+
+
+# Quote the whole listing for the requested quantities in one pass
+@app.get("/shows/prices", response_model=dict)
+async def get_show_prices(quantities: str = Query("1")):
+    try:
+        counts = [int(q) for q in quantities.split(",") if q.strip()]
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Quantities must be comma-separated integers.")
+    if not counts or min(counts) < 1:
+        raise HTTPException(status_code=400, detail="Quantities must be positive.")
+    try:
+        book = await get_price_book()
+    except DATABASE_UNAVAILABLE:
+        raise HTTPException(status_code=503, detail="Database temporarily unavailable.")
+    return {
+        event_id: dict(zip(map(str, counts), totals))
+        for event_id, totals in book.quote_many(None, counts).items()
+    }
 
 
 @app.get("/ticket_booking", response_model=dict)
-async def get_event(event_id: str = Query(..., alias="event_id")):
-    event = await shows_collections.find_one({"_id": ObjectId(event_id)})
+async def get_event(response: Response, event_id: str = Query(..., alias="event_id")):
+    try:
+        event = await guarded("shows", lambda: shows_collections.find_one({"_id": ObjectId(event_id)}, max_time_ms=OPERATION_TIMEOUT_MS))
+    except DATABASE_UNAVAILABLE:
+        event, saved_at = snapshot_event(event_id)
+        if not event:
+            raise HTTPException(status_code=503, detail="Database temporarily unavailable.")
+        response.headers.update(stale_headers(saved_at))
     if not event:
         raise HTTPException(status_code=404, detail="Event not found")
     return {
@@ -142,39 +271,96 @@ async def update_payment(payment_details: PaymentDetails, background_tasks: Back
     # Simulate payment processing here (add real payment gateway logic)
     # For simplicity, let's assume the payment is successful
 
-    # Insert payment details into the database
-    result = await payment_collection.insert_one(payment_details.dict())
-    if not result.inserted_id:
-        raise HTTPException(status_code=500, detail="Failed to save payment details")
-
-    # Find the event by eventId
-    event_id = ObjectId(payment_details.eventId)
-    event = await shows_collections.find_one({"_id": event_id})
-    if not event:
-        raise HTTPException(status_code=404, detail="Event not found")
-
-    # Update the number of tickets left
-    new_tickets_left = event.get("ticketsLeft", 0) - payment_details.seatCount
-    if new_tickets_left < 0:
-        raise HTTPException(status_code=400, detail="Not enough tickets left")
-
-    update_result = await shows_collections.update_one(
-        {"_id": event_id},
-        {"$set": {"ticketsLeft": new_tickets_left}}
-    )
-    if update_result.modified_count == 0:
-        raise HTTPException(status_code=500, detail="Failed to update tickets")
+    try:
+        # Find the event by eventId
+        event_id = ObjectId(payment_details.eventId)
+        event = await guarded("shows", lambda: shows_collections.find_one({"_id": event_id}, max_time_ms=OPERATION_TIMEOUT_MS))
+        if not event:
+            raise HTTPException(status_code=404, detail="Event not found")
+        if event.get("ticketsLeft", 0) < payment_details.seatCount:
+            raise HTTPException(status_code=400, detail="Not enough tickets left")
+
+        # The payment's id is chosen up front so its seat claims can be released if it fails
+        payment_id = ObjectId()
+        seats_event = payment_details.eventId
+        email = payment_details.email
+        # Seats held in the chat for this email become the paid seats; otherwise the client's
+        # picks are claimed, or the best available seats when it picked none
+        hold = await take_hold(seats_event, email, payment_details.seatCount, payment_details.selectedSeats, payment_id)
+        if hold:
+            payment_details.selectedSeats = hold["seats"]
+        elif payment_details.selectedSeats:
+            if not await claim_seats(seats_event, event, payment_details.selectedSeats, email, payment_id):
+                raise HTTPException(status_code=409, detail="Selected seats are no longer available")
+        else:
+            try:
+                payment_details.selectedSeats = await allocate_seats(seats_event, event, payment_details.seatCount, email, payment_id)
+            except ValueError:
+                raise HTTPException(status_code=400, detail="Not enough tickets left")
+
+        try:
+            # Update the number of tickets left, only if enough are still left
+            updated = await guarded("shows", lambda: shows_collections.find_one_and_update(
+                {"_id": event_id, "ticketsLeft": {"$gte": payment_details.seatCount}},
+                {"$inc": {"ticketsLeft": -payment_details.seatCount}},
+                projection={"ticketsLeft": 1},
+                return_document=ReturnDocument.AFTER,
+            ))
+            if not updated:
+                raise HTTPException(status_code=400, detail="Not enough tickets left")
+            try:
+                # Insert payment details into the database
+                await guarded("payments", lambda: payment_collection.insert_one({"_id": payment_id, **payment_details.dict()}))
+            except BaseException:
+                await guarded("shows", lambda: shows_collections.update_one(
+                    {"_id": event_id}, {"$inc": {"ticketsLeft": payment_details.seatCount}}))
+                raise
+        except BaseException:
+            await release_seats(seats_event, payment_id)
+            raise
+    except DATABASE_UNAVAILABLE:
+        raise HTTPException(status_code=503, detail="Database temporarily unavailable, please retry.")
+    new_tickets_left = updated["ticketsLeft"]
     tickets=payment_details.seatCount
     # Pass the event details to the send_email function using background tasks
-    background_tasks.add_task(send_email, payment_details.email, event,tickets)
+    background_tasks.add_task(send_email, payment_details.email, event, tickets, payment_id,
+                              payment_details.selectedSeats, payment_details.locale)
 
     return {
         "message": "Payment successful and tickets updated",
-        "id": str(result.inserted_id),
+        "id": str(payment_id),
         "ticketsLeft": new_tickets_left,
+        "selectedSeats": payment_details.selectedSeats,
         "email_status": "Email will be sent shortly"
     }
 
+# Stream payments as CSV/NDJSON straight from a batched cursor so large ranges use constant memory
+@app.get("/payments/export")
+async def export_payment_data(
+    event_id: str = Query(None, alias="event_id"),
+    start: str = Query(None, alias="from"),
+    end: str = Query(None, alias="to"),
+    fmt: str = Query("csv", alias="format"),
+    export_token: str = Header(None, alias="X-Export-Token"),
+):
+    if not export_authorized(export_token):
+        raise HTTPException(status_code=403, detail="Payment export is not available.")
+    if fmt not in EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"Unsupported format: {fmt}")
+    try:
+        start_at = parse_date(start)
+        end_at = parse_date(end, end=True)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid date format provided.")
+    formatter, media_type = EXPORT_FORMATS[fmt]
+    filename = f"payments.{fmt}"
+    return StreamingResponse(
+        formatter(iter_payments(event_id, start_at, end_at)),
+        media_type=media_type,
+        headers={"Content-Disposition": f"attachment; filename={filename}"},
+    )
+
+
 @app.post("/reserve_tickets/")
 async def reserve_tickets(response: TicketRequest):
     time_str = response.queryResult["parameters"]["time"]
@@ -205,594 +391,121 @@ async def reserve_tickets(response: TicketRequest):
 
 
 def handle_hindi(body):
-    response = {
-        "fulfillmentMessages": [
-            {
-                "text": {
-                    "text": [
-                        "मैं आपकी किस प्रकार मदद कर सकता हूँ?"
-                    ]
-                }
-            },
-            {
-                "payload": {
-                    "richContent": [
-                        [
-                            {
-                                "type": "chips",
-                                "options": [
-                                    {"text": "टिकट"},
-                                    {"text": "भाषा"}
-                                ]
-                            }
-                        ]
-                    ]
-                }
-            }
-        ]
-    }
-    return response
+    return render_greeting("hi")
 
 
-def handle_hindi_ticket(body):
-    response = {
-        "fulfillmentMessages": [
-            {
-                "payload": {
-                    "richContent": [
-                        [
-                            {
-                                "event": {
-                                    "name": "ReserveTicketsHindi",
-                                    "parameters": {
-                                        "ticket_type": "प्रवेश"
-                                    }
-                                },
-                                "title": "प्रवेश",
-                                "subtitle": "संग्रहालय तक प्रवेश\n₹70",
-                                "type": "list"
-                            },
-                            {
-                                "type": "divider"
-                            },
-                            {
-                                "event": {
-                                    "parameters": {
-                                        "ticket_type": "अनमोल धरोहर"
-                                    },
-                                    "name": "ReserveTicketsHindi"
-                                },
-                                "title": "अनमोल धरोहर",
-                                "subtitle": "ऐतिहासिक कलाकृतियों की प्रदर्शनी\n₹100",
-                                "type": "list"
-                            },
-                            {
-                                "type": "divider"
-                            },
-                            {
-                                "type": "list",
-                                "subtitle": "विभिन्न युगों की कला का विकास\n₹120",
-                                "title": "युगों के माध्यम से कला",
-                                "event": {
-                                    "name": "ReserveTicketsHindi",
-                                    "parameters": {
-                                        "ticket_type": "युगों के माध्यम से कला"
-                                    }
-                                }
-                            },
-                            {
-                                "type": "divider"
-                            },
-                            {
-                                "subtitle": "अतीत की छुपी कहानियों को जानें\n₹150",
-                                "type": "list",
-                                "title": "अनकही कहानियाँ",
-                                "event": {
-                                    "name": "ReserveTicketsHindi",
-                                    "parameters": {
-                                        "ticket_type": "अनकही कहानियाँ"
-                                    }
-                                }
-                            },
-                            {
-                                "type": "divider"
-                            },
-                            {
-                                "subtitle": "आधुनिकता का प्रदर्शन\n₹100",
-                                "event": {
-                                    "name": "ReserveTicketsHindi",
-                                    "parameters": {
-                                        "ticket_type": "आधुनिक माहिर"
-                                    }
-                                },
-                                "type": "list",
-                                "title": "आधुनिक माहिर"
-                            }
-                        ]
-                    ]
-                }
-
-            }
-        ]
-    }
-    return response
+async def handle_hindi_ticket(body):
+    return await compiled_ticket_menu("hi")
 
 
 def handle_marathi(body):
-    response = {
-        "fulfillmentMessages": [
-            {
-                "text": {
-                    "text": [
-                        "मी तुम्हाला कसे मदत करू शकतो?"
-                    ]
-                }
-            },
-            {
-                "payload": {
-                    "richContent": [
-                        [
-                            {
-                                "type": "chips",
-                                "options": [
-                                    {"text": "तिकिटे"},
-                                    {"text": "भाषा"}
-                                ]
-                            }
-                        ]
-                    ]
-                }
-            }
-        ]
-    }
-    return response
+    return render_greeting("mr")
 
 
-def handle_marathi_ticket(body):
-    response = {
-        "fulfillmentMessages": [
-            {
-                "payload": {
-                    "richContent": [
-                        [
-                            {
-                                "event": {
-                                    "name": "ReserveTicketsMarathi",
-                                    "parameters": {
-                                        "ticket_type": "प्रवेश"
-                                    }
-                                },
-                                "title": "प्रवेश",
-                                "subtitle": "संग्रहालयात प्रवेश\n₹70",
-                                "type": "list"
-                            },
-                            {
-                                "type": "divider"
-                            },
-                            {
-                                "event": {
-                                    "name": "ReserveTicketsMarathi",
-                                    "parameters": {
-                                        "ticket_type": "अमर खजिना"
-                                    }
-                                },
-                                "title": "अमर खजिना",
-                                "subtitle": "ऐतिहासिक कलाकृतींचे प्रदर्शन\n₹100",
-                                "type": "list"
-                            },
-                            {
-                                "type": "divider"
-                            },
-                            {
-                                "type": "list",
-                                "title": "युगानुयुगे कला",
-                                "subtitle": "विविध कालखंडातील कलेचा विकास\n₹120",
-                                "event": {
-                                    "name": "ReserveTicketsMarathi",
-                                    "parameters": {
-                                        "ticket_type": "युगानुयुगे कला"
-                                    }
-                                }
-                            },
-                            {
-                                "type": "divider"
-                            },
-                            {
-                                "type": "list",
-                                "title": "अकथित कथा",
-                                "subtitle": "भूतकाळातील लपलेल्या कथा उलगडा करा\n₹150",
-                                "event": {
-                                    "name": "ReserveTicketsMarathi",
-                                    "parameters": {
-                                        "ticket_type": "अकथित कथा"
-                                    }
-                                }
-                            },
-                            {
-                                "type": "divider"
-                            },
-                            {
-                                "type": "list",
-                                "title": "आधुनिक माहेर",
-                                "subtitle": "आधुनिकतेचे प्रदर्शन\n₹100",
-                                "event": {
-                                    "name": "ReserveTicketsMarathi",
-                                    "parameters": {
-                                        "ticket_type": "आधुनिक माहेर"
-                                    }
-                                }
-                            }
-                        ]
-                    ]
-                }
-            }
-        ]
-    }
-    return response
+async def handle_marathi_ticket(body):
+    return await compiled_ticket_menu("mr")
 
 
 def handle_bengali(body):
-    response = {
-        "fulfillmentMessages": [
-            {
-                "text": {
-                    "text": [
-                        "কিভাবে আমি আপনাকে সাহায্য করতে পারি?"
-                    ]
-                }
-            },
-            {
-                "payload": {
-                    "richContent": [
-                        [
-                            {
-                                "type": "chips",
-                                "options": [
-                                    {"text": "টিকেট"},
-                                    {"text": "ভাষা"}
-                                ]
-                            }
-                        ]
-                    ]
-                }
-            }
-        ]
-    }
-    return response
+    return render_greeting("bn")
 
 
-def handle_bengali_ticket(body):
-    response = {
-        "fulfillmentMessages": [
-            {
-                "payload": {
-                    "richContent": [
-                        [
-                            {
-                                "event": {
-                                    "name": "ReserveTicketsBengali",
-                                    "parameters": {
-                                        "ticket_type": "প্রবেশ"
-                                    }
-                                },
-                                "title": "প্রবেশ",
-                                "subtitle": "জাদুঘরে প্রবেশাধিকার\n₹70",
-                                "type": "list"
-                            },
-                            {
-                                "type": "divider"
-                            },
-                            {
-                                "event": {
-                                    "name": "ReserveTicketsBengali",
-                                    "parameters": {
-                                        "ticket_type": "চিরন্তন ধন"
-                                    }
-                                },
-                                "title": "চিরন্তন ধন",
-                                "subtitle": "ঐতিহাসিক নিদর্শনের প্রদর্শনী\n₹100",
-                                "type": "list"
-                            },
-                            {
-                                "type": "divider"
-                            },
-                            {
-                                "type": "list",
-                                "title": "যুগে যুগে শিল্পকলা",
-                                "subtitle": "বিভিন্ন যুগের শিল্পকলার বিকাশ\n₹120",
-                                "event": {
-                                    "name": "ReserveTicketsBengali",
-                                    "parameters": {
-                                        "ticket_type": "যুগে যুগে শিল্পকলা"
-                                    }
-                                }
-                            },
-                            {
-                                "type": "divider"
-                            },
-                            {
-                                "type": "list",
-                                "title": "অজানা গল্পগুলি",
-                                "subtitle": "অতীতের গোপন গল্প আবিষ্কার করুন\n₹150",
-                                "event": {
-                                    "name": "ReserveTicketsBengali",
-                                    "parameters": {
-                                        "ticket_type": "অজানা গল্পগুলি"
-                                    }
-                                }
-                            },
-                            {
-                                "type": "divider"
-                            },
-                            {
-                                "type": "list",
-                                "title": "আধুনিক মায়েস্ত্রো",
-                                "subtitle": "আধুনিকতার প্রদর্শনী\n₹100",
-                                "event": {
-                                    "name": "ReserveTicketsBengali",
-                                    "parameters": {
-                                        "ticket_type": "আধুনিক মায়েস্ত্রো"
-                                    }
-                                }
-                            }
-                        ]
-                    ]
-                }
-            }
-        ]
-    }
-    return response
+async def handle_bengali_ticket(body):
+    return await compiled_ticket_menu("bn")
 
 
 def handle_tamil(body):
-    response = {
-        "fulfillmentMessages": [
-            {
-                "text": {
-                    "text": [
-                        "நான் உங்களுக்கு எப்படி உதவ முடியும்?"
-                    ]
-                }
-            },
-            {
-                "payload": {
-                    "richContent": [
-                        [
-                            {
-                                "type": "chips",
-                                "options": [
-                                    {"text": "டிக்கெட்டுகள்"},
-                                    {"text": "மொழி"}
-                                ]
-                            }
-                        ]
-                    ]
-                }
-            }
-        ]
-    }
-    return response
+    return render_greeting("ta")
 
 
-def handle_tamil_ticket(body):
-    response = {
-        "fulfillmentMessages": [
-            {
-                "payload": {
-                    "richContent": [
-                        [
-                            {
-                                "event": {
-                                    "name": "ReserveTicketsTamil",
-                                    "parameters": {
-                                        "ticket_type": "நுழைவு"
-                                    }
-                                },
-                                "title": "நுழைவு",
-                                "subtitle": "அருங்காட்சியகத்தில் நுழைவு\n₹70",
-                                "type": "list"
-                            },
-                            {
-                                "type": "divider"
-                            },
-                            {
-                                "event": {
-                                    "name": "ReserveTicketsTamil",
-                                    "parameters": {
-                                        "ticket_type": "நிறம்கொடையில்லா நிதிகள்"
-                                    }
-                                },
-                                "title": "நிறம்கொடையில்லா நிதிகள்",
-                                "subtitle": "வரலாற்று பொருட்களின் கண்காட்சி\n₹100",
-                                "type": "list"
-                            },
-                            {
-                                "type": "divider"
-                            },
-                            {
-                                "type": "list",
-                                "title": "காலங்களின் வழியாகக் கலை",
-                                "subtitle": "பல்வேறு காலக்கட்டங்களில் கலை வளர்ச்சி\n₹120",
-                                "event": {
-                                    "name": "ReserveTicketsTamil",
-                                    "parameters": {
-                                        "ticket_type": "காலங்களின் வழியாகக் கலை"
-                                    }
-                                }
-                            },
-                            {
-                                "type": "divider"
-                            },
-                            {
-                                "type": "list",
-                                "title": "சொல்லப்படாத கதைகள்",
-                                "subtitle": "கடந்த காலத்தின் மறைந்த கதைகளை கண்டறியுங்கள்\n₹150",
-                                "event": {
-                                    "name": "ReserveTicketsTamil",
-                                    "parameters": {
-                                        "ticket_type": "சொல்லப்படாத கதைகள்"
-                                    }
-                                }
-                            },
-                            {
-                                "type": "divider"
-                            },
-                            {
-                                "type": "list",
-                                "title": "நவீன இசைஞர்",
-                                "subtitle": "நவீனத்தை அறிமுகப்படுத்துகிறது\n₹100",
-                                "event": {
-                                    "name": "ReserveTicketsTamil",
-                                    "parameters": {
-                                        "ticket_type": "நவீன இசைஞர்"
-                                    }
-                                }
-                            }
-                        ]
-                    ]
-                }
-            }
-        ]
-    }
-    return response
+async def handle_tamil_ticket(body):
+    return await compiled_ticket_menu("ta")
 
 
-def handle_telugu_ticket(body):
-    response = {
-        "fulfillmentMessages": [
-            {
-                "payload": {
-                    "richContent": [
-                        [
-                            {
-                                "event": {
-                                    "name": "ReserveTicketsTelugu",
-                                    "parameters": {
-                                        "ticket_type": "ప్రవేశం"
-                                    }
-                                },
-                                "title": "ప్రవేశం",
-                                "subtitle": "సంగ్రహాలయంలోకి ప్రవేశం\n₹70",
-                                "type": "list"
-                            },
-                            {
-                                "type": "divider"
-                            },
-                            {
-                                "event": {
-                                    "name": "ReserveTicketsTelugu",
-                                    "parameters": {
-                                        "ticket_type": "శాశ్వత ఖజానా"
-                                    }
-                                },
-                                "title": "శాశ్వత ఖజానా",
-                                "subtitle": "చారిత్రక కళాఖండాల ప్రదర్శన\n₹100",
-                                "type": "list"
-                            },
-                            {
-                                "type": "divider"
-                            },
-                            {
-                                "type": "list",
-                                "title": "యుగాల ద్వారా కళ",
-                                "subtitle": "వివిధ యుగాలలో కళ యొక్క పరిణామం\n₹120",
-                                "event": {
-                                    "name": "ReserveTicketsTelugu",
-                                    "parameters": {
-                                        "ticket_type": "యుగాల ద్వారా కళ"
-                                    }
-                                }
-                            },
-                            {
-                                "type": "divider"
-                            },
-                            {
-                                "type": "list",
-                                "title": "చెప్పని కథలు",
-                                "subtitle": "గతంలోని దాచిన కథలను వెలికితీయండి\n₹150",
-                                "event": {
-                                    "name": "ReserveTicketsTelugu",
-                                    "parameters": {
-                                        "ticket_type": "చెప్పని కథలు"
-                                    }
-                                }
-                            },
-                            {
-                                "type": "divider"
-                            },
-                            {
-                                "type": "list",
-                                "title": "ఆధునిక మాస్ట్రో",
-                                "subtitle": "ఆధునికతను ప్రదర్శిస్తోంది\n₹100",
-                                "event": {
-                                    "name": "ReserveTicketsTelugu",
-                                    "parameters": {
-                                        "ticket_type": "ఆధునిక మాస్ట్రో"
-                                    }
-                                }
-                            }
-                        ]
-                    ]
-                }
-            }
-        ]
-    }
-    return response
+async def handle_telugu_ticket(body):
+    return await compiled_ticket_menu("te")
 
 
 def handle_telugu(body):
-    response = {
-        "fulfillmentMessages": [
-            {
-                "text": {
-                    "text": [
-                        "నేను మీకు ఎలా సహాయపడగలను?"
-                    ]
-                }
-            },
-            {
-                "payload": {
-                    "richContent": [
-                        [
-                            {
-                                "type": "chips",
-                                "options": [
-                                    {"text": "టిక్కెట్లు"},
-                                    {"text": "భాష"}
-                                ]
-                            }
-                        ]
-                    ]
-                }
-            }
-        ]
-    }
-    return response
-async def handle_reserve_tickets(body, background_tasks: BackgroundTasks):
+    return render_greeting("te")
+
+
+async def quote_total(event_id: str, quantity: int):
+    # None when the event is unknown or no price table can be loaded; callers use list prices
+    try:
+        return (await get_price_book()).quote(event_id, quantity)
+    except Exception as e:
+        print(f"Prices unavailable, using list prices: {e}")
+        return None
+
+
+async def compiled_ticket_menu(locale: str):
+    # Menus show live unit prices; each (locale, prices) combination is rendered once
+    view = shared_catalog.current() if shared_catalog else None
+    if view is not None:
+        menus = view.get(current_tenant.get(), "menus")
+        if menus and locale in menus:
+            return menus[locale]
+    try:
+        prices = (await get_price_book()).unit_prices()
+    except Exception as e:
+        print(f"Prices unavailable, using list prices: {e}")
+        prices = {}
+    cache = tenant_cache("menus")
+    key = (locale, tuple(sorted(prices.items())))
+    menu = cache.get(key)
+    if menu is None:
+        if len(cache) > 256:
+            cache.clear()
+        menu = cache[key] = render_ticket_menu(locale, prices)
+    return menu
+
+
+async def handle_reserve_tickets(body, session: dict, session_id: str = None):
     parameters = body.get("queryResult", {}).get("parameters", {})
     ticket = int(parameters.get("ticket", 0))  
     email = parameters.get("email").lower()
     ticket_type = parameters.get("ticket_type")
-    if ticket_type=="Timeless Treasures":
-        id="66e561e683e976b3c870f7ff"
-    elif ticket_type=="Art Through the Ages":
-        id="66e561e683e976b3c870f800"
-    elif ticket_type=="Stories Untold":
-        id="66e561e683e976b3c870f801"
-    elif ticket_type=="Modern Maestro":
-        id="66e561e683e976b3c870f802"
+    if not ticket_type and session.get("event"):
+        # Follow-up turn without a ticket type: keep the event chosen earlier in the conversation
+        id = session["event"]["id"]
     else:
-        id="66e561e483e976b3c870f7fe"
-    event = await shows_collections.find_one({"id": id})
-    background_tasks.add_task(send_email, email, event, ticket)
-    ticket_cost = event['price_int']
-    total_cost = ticket * ticket_cost
+        id = event_id_for(ticket_type)
+    event = session.get("event")
+    if not event or event.get("id") != id:
+        try:
+            event = await guarded("shows", lambda: shows_collections.find_one({"id": id}, max_time_ms=OPERATION_TIMEOUT_MS))
+        except DATABASE_UNAVAILABLE:
+            event, _ = snapshot_event(id)
+            if not event:
+                raise
+        session["event"] = event
+    session["pendingTickets"] = ticket
+    session["email"] = email
+    # Hold the best available block in Mongo until the payment (from the same email) takes it
+    # over; a repeated turn for the same event and count keeps the hold it already has.
+    # Snapshot events carry no _id, so nothing is held while the database is down.
+    held = session.get("pendingSeats") or []
+    seats_event = str(event["_id"]) if event.get("_id") else None
+    if seats_event and (session.get("pendingSeatsEvent") != seats_event or len(held) != ticket
+                        or session.get("pendingSeatsUntil", 0) <= time.time()):
+        try:
+            held = await hold_seats(seats_event, event, ticket, email, session_id)
+            session["pendingSeatsUntil"] = time.time() + SEAT_HOLD_SECONDS
+        except (ValueError, *DATABASE_UNAVAILABLE):
+            held = []
+        session["pendingSeats"] = held
+        session["pendingSeatsEvent"] = seats_event
+    total_cost = await quote_total(id, ticket)
+    if total_cost is None:
+        total_cost = ticket * event['price_int']
+    seats_text = f"\nSeats held for {SEAT_HOLD_SECONDS // 60} minutes: {', '.join(map(str, held))}" if held else ""
     response = {
         "fulfillmentMessages": [
             {
                 "text": {
                     "text": [
-                        f"Your total is ₹{total_cost}, \nthe tickets will be mailed to you at {email}.\nProceed for payment:"
+                        f"Your total is ₹{total_cost}, \nthe tickets will be mailed to you at {email}.{seats_text}\nProceed for payment:"
                     ]
                 }
             },
@@ -841,34 +554,25 @@ async def handle_reserve_tickets(body, background_tasks: BackgroundTasks):
     return response
 
 
-def handle_text_tickets(body):
+async def handle_text_tickets(body):
     parameters = body.get("queryResult", {}).get("parameters", {})
     ticket = int(parameters.get("Ticket", 0))
-    ticket_cost = 70
-    total_cost = ticket * ticket_cost
+    total_cost = await quote_total(ENTRY_EVENT_ID, ticket)
+    if total_cost is None:
+        total_cost = ticket * DEFAULT_PRICES[ENTRY_EVENT_ID]
     payment_link = 'ticket-bot-one.vercel.app'
     fulfillment_text = f"Your total is ₹{total_cost},\n proceed for payment: \n{payment_link}."
     response = {"fulfillmentText": fulfillment_text}
     return response
 
-def faq(body):
-
+async def faq(body, session: dict):
     parameters = body.get("queryResult", {}).get("parameters", {})
-    faq = parameters.get("faq", "").lower()
-    faq_responses = {
-        "museum": "The museum is open from 9 AM to 5 PM every day except Sundays.",
-        "location": "We are located at 1234 Museum Street, Art City.",
-        "about": "Our museum houses a vast collection of art, history, and culture from around the world.",
-        "modern maestro": "The 'Modern Maestro' exhibit showcases contemporary artists redefining the art scene.\n  Entry ticket - ₹100 per person",
-        "stories untold": "'Stories Untold' delves into hidden narratives of underrepresented artists.\n  Entry ticket - ₹150 per person",
-        "art through the ages": "'Art Through the Ages' is a journey through art history, from ancient to modern times.\n  Entry ticket - ₹120 per person",
-        "timeless treasures": "'Timeless Treasures' features iconic pieces that have withstood the test of time.\n  Entry ticket - ₹100 per person"
-    }
-    response_text = faq_responses.get(faq, "I'm sorry, I don't have information on that topic.")
+    question = parameters.get("faq", "")
+    engine = await faq_source().get()
+    response_text = engine.answer(question, session.get("locale"))
     return {
         "fulfillmentText": response_text
     }
-    return response
 
 
 
@@ -891,20 +595,44 @@ INTENT_HANDLERS = {
     "LangTelugu": handle_telugu_ticket,
 }
 
+# Intents that pick a chat language, remembered for the rest of the session
+INTENT_LOCALES = {
+    "hindi": "hi",
+    "marathi": "mr",
+    "bengali": "bn",
+    "tamil": "ta",
+    "telugu": "te",
+    "LangHindi": "hi",
+    "LangMarathi": "mr",
+    "LangBengali": "bn",
+    "LangTamil": "ta",
+    "LangTelugu": "te",
+}
+
 
 @app.post("/webhook")
-async def webhook(request: Request, background_tasks: BackgroundTasks):
+async def webhook(request: Request):
     try:
         body = await request.json()
         intent_name = body.get("queryResult", {}).get("intent", {}).get("displayName")
+        request.state.intent_name = intent_name
 
         handler = INTENT_HANDLERS.get(intent_name)
-        
+        session_id = body.get("session")
+        session = await session_store.get(session_id)
+        if intent_name in INTENT_LOCALES:
+            session["locale"] = INTENT_LOCALES[intent_name]
+
         if handler == handle_reserve_tickets:
-            response = await handle_reserve_tickets(body, background_tasks)
+            response = await handle_reserve_tickets(body, session, session_id)
+        elif handler == faq:
+            response = await faq(body, session)
         else:
             response = handler(body)
+            if inspect.isawaitable(response):
+                response = await response
 
+        await session_store.save(session_id, session)
         return response
 
     except Exception as e:
@@ -0,0 +1,154 @@
+# Chatbot menus per locale. Ticket items follow MENU_EVENT_IDS; prices are filled in when compiled.
+ENTRY_EVENT_ID = "66e561e483e976b3c870f7fe"
+MENU_EVENT_IDS = [
+    ENTRY_EVENT_ID,
+    "66e561e683e976b3c870f7ff",
+    "66e561e683e976b3c870f800",
+    "66e561e683e976b3c870f801",
+    "66e561e683e976b3c870f802",
+]
+# Used until the catalog has been loaded
+DEFAULT_PRICES = {
+    ENTRY_EVENT_ID: 70,
+    "66e561e683e976b3c870f7ff": 100,
+    "66e561e683e976b3c870f800": 120,
+    "66e561e683e976b3c870f801": 150,
+    "66e561e683e976b3c870f802": 100,
+}
+ENGLISH_TICKET_TYPES = {
+    "Timeless Treasures": "66e561e683e976b3c870f7ff",
+    "Art Through the Ages": "66e561e683e976b3c870f800",
+    "Stories Untold": "66e561e683e976b3c870f801",
+    "Modern Maestro": "66e561e683e976b3c870f802",
+}
+
+LOCALE_MENUS = {
+    "hi": {
+        "greeting": "मैं आपकी किस प्रकार मदद कर सकता हूँ?",
+        "chips": ["टिकट", "भाषा"],
+        "event": "ReserveTicketsHindi",
+        "items": [
+            ("प्रवेश", "संग्रहालय तक प्रवेश"),
+            ("अनमोल धरोहर", "ऐतिहासिक कलाकृतियों की प्रदर्शनी"),
+            ("युगों के माध्यम से कला", "विभिन्न युगों की कला का विकास"),
+            ("अनकही कहानियाँ", "अतीत की छुपी कहानियों को जानें"),
+            ("आधुनिक माहिर", "आधुनिकता का प्रदर्शन"),
+        ],
+    },
+    "mr": {
+        "greeting": "मी तुम्हाला कसे मदत करू शकतो?",
+        "chips": ["तिकिटे", "भाषा"],
+        "event": "ReserveTicketsMarathi",
+        "items": [
+            ("प्रवेश", "संग्रहालयात प्रवेश"),
+            ("अमर खजिना", "ऐतिहासिक कलाकृतींचे प्रदर्शन"),
+            ("युगानुयुगे कला", "विविध कालखंडातील कलेचा विकास"),
+            ("अकथित कथा", "भूतकाळातील लपलेल्या कथा उलगडा करा"),
+            ("आधुनिक माहेर", "आधुनिकतेचे प्रदर्शन"),
+        ],
+    },
+    "bn": {
+        "greeting": "কিভাবে আমি আপনাকে সাহায্য করতে পারি?",
+        "chips": ["টিকেট", "ভাষা"],
+        "event": "ReserveTicketsBengali",
+        "items": [
+            ("প্রবেশ", "জাদুঘরে প্রবেশাধিকার"),
+            ("চিরন্তন ধন", "ঐতিহাসিক নিদর্শনের প্রদর্শনী"),
+            ("যুগে যুগে শিল্পকলা", "বিভিন্ন যুগের শিল্পকলার বিকাশ"),
+            ("অজানা গল্পগুলি", "অতীতের গোপন গল্প আবিষ্কার করুন"),
+            ("আধুনিক মায়েস্ত্রো", "আধুনিকতার প্রদর্শনী"),
+        ],
+    },
+    "ta": {
+        "greeting": "நான் உங்களுக்கு எப்படி உதவ முடியும்?",
+        "chips": ["டிக்கெட்டுகள்", "மொழி"],
+        "event": "ReserveTicketsTamil",
+        "items": [
+            ("நுழைவு", "அருங்காட்சியகத்தில் நுழைவு"),
+            ("நிறம்கொடையில்லா நிதிகள்", "வரலாற்று பொருட்களின் கண்காட்சி"),
+            ("காலங்களின் வழியாகக் கலை", "பல்வேறு காலக்கட்டங்களில் கலை வளர்ச்சி"),
+            ("சொல்லப்படாத கதைகள்", "கடந்த காலத்தின் மறைந்த கதைகளை கண்டறியுங்கள்"),
+            ("நவீன இசைஞர்", "நவீனத்தை அறிமுகப்படுத்துகிறது"),
+        ],
+    },
+    "te": {
+        "greeting": "నేను మీకు ఎలా సహాయపడగలను?",
+        "chips": ["టిక్కెట్లు", "భాష"],
+        "event": "ReserveTicketsTelugu",
+        "items": [
+            ("ప్రవేశం", "సంగ్రహాలయంలోకి ప్రవేశం"),
+            ("శాశ్వత ఖజానా", "చారిత్రక కళాఖండాల ప్రదర్శన"),
+            ("యుగాల ద్వారా కళ", "వివిధ యుగాలలో కళ యొక్క పరిణామం"),
+            ("చెప్పని కథలు", "గతంలోని దాచిన కథలను వెలికితీయండి"),
+            ("ఆధునిక మాస్ట్రో", "ఆధునికతను ప్రదర్శిస్తోంది"),
+        ],
+    },
+}
+
+# Every ticket_type the menus can send back, in any language, mapped to its event id
+TICKET_TYPE_IDS = dict(ENGLISH_TICKET_TYPES)
+for _menu in LOCALE_MENUS.values():
+    for _event_id, (_title, _description) in zip(MENU_EVENT_IDS, _menu["items"]):
+        TICKET_TYPE_IDS.setdefault(_title, _event_id)
+
+
+def event_id_for(ticket_type) -> str:
+    return TICKET_TYPE_IDS.get(ticket_type, ENTRY_EVENT_ID)
+
+
+def render_greeting(locale: str) -> dict:
+    menu = LOCALE_MENUS[locale]
+    return {
+        "fulfillmentMessages": [
+            {
+                "text": {
+                    "text": [
+                        menu["greeting"]
+                    ]
+                }
+            },
+            {
+                "payload": {
+                    "richContent": [
+                        [
+                            {
+                                "type": "chips",
+                                "options": [{"text": chip} for chip in menu["chips"]]
+                            }
+                        ]
+                    ]
+                }
+            }
+        ]
+    }
+
+
+def render_ticket_menu(locale: str, prices: dict) -> dict:
+    menu = LOCALE_MENUS[locale]
+    items = []
+    for event_id, (title, description) in zip(MENU_EVENT_IDS, menu["items"]):
+        if items:
+            items.append({"type": "divider"})
+        price = prices.get(event_id, DEFAULT_PRICES[event_id])
+        items.append({
+            "event": {
+                "name": menu["event"],
+                "parameters": {
+                    "ticket_type": title
+                }
+            },
+            "title": title,
+            "subtitle": f"{description}\n₹{price}",
+            "type": "list"
+        })
+    return {
+        "fulfillmentMessages": [
+            {
+                "payload": {
+                    "richContent": [
+                        items
+                    ]
+                }
+            }
+        ]
+    }
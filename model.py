@@ -1,5 +1,6 @@
 from bson import ObjectId
-from pydantic import BaseModel, EmailStr
+from pydantic import BaseModel, EmailStr, field_validator
+from datetime import datetime, timezone
 from typing import Dict, Optional, Any, List
 
 
@@ -37,12 +38,30 @@ class Shows(BaseModel):
     price_int: int
 
 
+# Entry in /shows/search results, read straight from the schedule index
+class ShowSlot(BaseModel):
+    id: str
+    title: str
+    location: str
+    startsAt: datetime
+    ticketsLeft: int
+
+    @field_validator("startsAt")
+    @classmethod
+    def stored_as_utc(cls, value: datetime) -> datetime:
+        # Mongo returns naive datetimes that are UTC
+        return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+
+
 class PaymentDetails(BaseModel):
     eventId: str
-    selectedSeats: List[int]
+    # Leave empty to have the best available seats allocated
+    selectedSeats: List[int] = []
     seatCount: int
     email: EmailStr
     amount: float
+    # Language of the confirmation email (en, hi, mr, bn, ta, te)
+    locale: Optional[str] = None
 
 
 class TicketRequest(BaseModel):
@@ -0,0 +1,162 @@
+import time
+from bisect import bisect_right
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional
+
+import pytz
+
+from database import current_tenant, payment_collection, shows_collections
+from resilience import OPERATION_TIMEOUT_MS, guarded, snapshots
+from shared_catalog import shared_catalog
+from tenants import tenant_cache
+
+# Optional pricing rules stored on a show document; price_int stays the base price:
+#   "pricing": {
+#       "groupDiscounts": [[10, 0.10], [25, 0.15]],  # from this many tickets, fraction off
+#       "timeOfDay": [[17, 21, 1.2]],                 # from hour, to hour (venue time), multiplier
+#       "surge": [[0.2, 1.25], [0.1, 1.5]],           # share of capacity left at or below, multiplier
+#       "capacity": 500                               # see price_rows() when absent
+#   }
+PRICING_TZ = pytz.timezone("Asia/Kolkata")
+PRICE_BOOK_TTL = 60
+PRICE_BOOK_PROJECTION = {"id": 1, "price_int": 1, "ticketsLeft": 1, "pricing": 1, "layout": 1}
+PRICE_ROW_FIELDS = ("id", "price_int", "ticketsLeft", "pricing")
+
+
+class PriceBook:
+    # Column-oriented price tables for the whole catalog, so a listing is quoted in one pass
+    def __init__(self, shows: Iterable[dict]):
+        self.ids: List[str] = []
+        self.base: List[int] = []
+        self.left: List[int] = []
+        self.capacity: List[int] = []
+        self.discount_from: List[List[int]] = []
+        self.discount_off: List[List[float]] = []
+        self.time_rules: List[list] = []
+        self.surge: List[list] = []
+        self.index: Dict[str, int] = {}
+        for show in shows:
+            self.add(show)
+        self.loaded_at = time.monotonic()
+
+    def add(self, show: dict):
+        rules = show.get("pricing") or {}
+        tiers = sorted(rules.get("groupDiscounts", []))
+        self.index[show["id"]] = len(self.ids)
+        self.ids.append(show["id"])
+        self.base.append(int(show.get("price_int", 0)))
+        left = int(show.get("ticketsLeft", 0))
+        self.left.append(left)
+        self.capacity.append(max(1, int(rules.get("capacity") or show.get("capacity") or left)))
+        self.discount_from.append([int(tier[0]) for tier in tiers])
+        self.discount_off.append([float(tier[1]) for tier in tiers])
+        self.time_rules.append(rules.get("timeOfDay", []))
+        # Most scarce tier first, so the first matching tier wins
+        self.surge.append(sorted(rules.get("surge", [])))
+
+    def multipliers(self, now: Optional[datetime] = None) -> List[float]:
+        # Time-of-day and inventory surge factors for every event
+        hour = (now or datetime.now(PRICING_TZ)).astimezone(PRICING_TZ).hour
+        result = []
+        for i in range(len(self.ids)):
+            factor = 1.0
+            for start, end, multiplier in self.time_rules[i]:
+                if start <= hour < end:
+                    factor *= multiplier
+                    break
+            remaining = self.left[i] / self.capacity[i]
+            for threshold, multiplier in self.surge[i]:
+                if remaining <= threshold:
+                    factor *= multiplier
+                    break
+            result.append(factor)
+        return result
+
+    def quote_many(self, event_ids: Optional[Iterable[str]] = None, quantities: Iterable[int] = (1,),
+                   now: Optional[datetime] = None) -> Dict[str, List[int]]:
+        # Totals for every requested event x quantity; unknown events are skipped
+        quantities = list(quantities)
+        factors = self.multipliers(now)
+        rows = range(len(self.ids)) if event_ids is None else [self.index[e] for e in event_ids if e in self.index]
+        quotes = {}
+        for i in rows:
+            unit = self.base[i] * factors[i]
+            starts, offs = self.discount_from[i], self.discount_off[i]
+            totals = []
+            for quantity in quantities:
+                tier = bisect_right(starts, quantity)
+                off = offs[tier - 1] if tier else 0.0
+                totals.append(round(unit * quantity * (1 - off)))
+            quotes[self.ids[i]] = totals
+        return quotes
+
+    def quote(self, event_id: str, quantity: int, now: Optional[datetime] = None) -> Optional[int]:
+        totals = self.quote_many([event_id], [quantity], now).get(event_id)
+        return totals[0] if totals else None
+
+    def unit_prices(self, now: Optional[datetime] = None) -> Dict[str, int]:
+        return {event_id: totals[0] for event_id, totals in self.quote_many(None, [1], now).items()}
+
+
+async def sold_counts(event_ids: List[str]) -> Dict[str, int]:
+    # Tickets paid for per event; payments reference shows by their ObjectId string
+    if not event_ids:
+        return {}
+    try:
+        rows = await guarded("payments", lambda: payment_collection.aggregate([
+            {"$match": {"eventId": {"$in": event_ids}}},
+            {"$group": {"_id": "$eventId", "sold": {"$sum": "$seatCount"}}},
+        ], maxTimeMS=OPERATION_TIMEOUT_MS).to_list(None))
+    except Exception as e:
+        print(f"Sold counts unavailable, surge uses tickets left only: {e}")
+        return {}
+    return {row["_id"]: int(row["sold"]) for row in rows}
+
+
+async def price_rows(shows: List[dict]) -> List[dict]:
+    # Price book input for shows read with PRICE_BOOK_PROJECTION. Surge compares tickets left
+    # with the show's full size: pricing.capacity, else the seat layout, else sold + left
+    def layout_size(show):
+        layout = show.get("layout") or {}
+        return sum(int(row["seats"]) for section in layout.get("sections", []) for row in section["rows"])
+
+    shows = [show for show in shows if show.get("id")]
+    unsized = [str(show["_id"]) for show in shows
+               if "_id" in show and not (show.get("pricing") or {}).get("capacity") and not layout_size(show)]
+    sold = await sold_counts(unsized)
+    rows = []
+    for show in shows:
+        row = {key: show[key] for key in PRICE_ROW_FIELDS if key in show}
+        row["capacity"] = layout_size(show) or int(show.get("ticketsLeft", 0)) + sold.get(str(show.get("_id")), 0)
+        rows.append(row)
+    return rows
+
+
+async def get_price_book() -> PriceBook:
+    # One price book per tenant, rebuilt from the catalog at most every PRICE_BOOK_TTL seconds
+    cache = tenant_cache("pricing")
+    view = shared_catalog.current() if shared_catalog else None
+    if view is not None:
+        # Multi-worker mode: price tables come from the shared snapshot, not from Mongo
+        shows = view.get(current_tenant.get(), "pricing")
+        if shows is not None:
+            if cache.get("version") != view.version:
+                cache["book"] = PriceBook(shows)
+                cache["version"] = view.version
+            return cache["book"]
+    book = cache.get("book")
+    if book is None or time.monotonic() - book.loaded_at > PRICE_BOOK_TTL:
+        try:
+            shows = await guarded("shows", lambda: shows_collections.find(
+                {}, PRICE_BOOK_PROJECTION).max_time_ms(OPERATION_TIMEOUT_MS).to_list(None))
+            book = cache["book"] = PriceBook(await price_rows(shows))
+        except Exception as e:
+            if book is None:
+                # Cold start during an outage: price from the last catalog snapshot
+                snapshot = snapshots.load("shows")
+                if snapshot is None:
+                    raise
+                book = cache["book"] = PriceBook(show for show in snapshot[0] if show.get("id"))
+            print(f"Failed to refresh prices, keeping previous table: {e}")
+            book.loaded_at = time.monotonic()
+    return book
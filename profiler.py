@@ -0,0 +1,81 @@
+import cProfile
+import hmac
+import os
+import random
+import re
+import time
+
+# Profiling is off unless PROFILE_SAMPLE_RATE > 0 or a request sends "X-Profile: <PROFILE_TOKEN>";
+# the header is ignored when PROFILE_TOKEN is unset. Sampled requests are only kept when they
+# take at least PROFILE_THRESHOLD_MS, and only the newest PROFILE_MAX_FILES profiles are kept.
+PROFILE_DIR = os.getenv("PROFILE_DIR", "profiles")
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+PROFILE_THRESHOLD = float(os.getenv("PROFILE_THRESHOLD_MS", "500")) / 1000
+PROFILE_TOKEN = os.getenv("PROFILE_TOKEN")
+PROFILE_MAX_FILES = int(os.getenv("PROFILE_MAX_FILES", "50"))
+PROFILE_HEADER = "x-profile"
+
+_UNSAFE = re.compile(r"[^A-Za-z0-9_-]+")
+# cProfile hooks the whole thread, so only one request is profiled at a time
+_active = False
+
+
+def requested(request) -> bool:
+    token = request.headers.get(PROFILE_HEADER)
+    return bool(PROFILE_TOKEN) and token is not None and hmac.compare_digest(token.encode(), PROFILE_TOKEN.encode())
+
+
+def should_profile(request) -> bool:
+    if _active:
+        return False
+    if requested(request):
+        return True
+    return PROFILE_SAMPLE_RATE > 0 and random.random() < PROFILE_SAMPLE_RATE
+
+
+def profile_path(route: str, intent, elapsed: float) -> str:
+    stamp = time.strftime("%Y%m%d-%H%M%S")
+    parts = [stamp, _UNSAFE.sub("_", route.strip("/")) or "root"]
+    if intent:
+        parts.append(_UNSAFE.sub("_", intent))
+    parts.append(f"{int(elapsed * 1000)}ms")
+    return os.path.join(PROFILE_DIR, "_".join(parts) + ".prof")
+
+
+def prune_profiles(keep: int = PROFILE_MAX_FILES):
+    names = sorted(name for name in os.listdir(PROFILE_DIR) if name.endswith(".prof"))
+    # Names start with a timestamp, so the oldest sort first
+    for name in names[:max(0, len(names) - keep)]:
+        try:
+            os.remove(os.path.join(PROFILE_DIR, name))
+        except OSError:
+            pass
+
+
+async def profile_request(request, call_next):
+    global _active
+    forced = requested(request)
+    profiler = cProfile.Profile()
+    _active = True
+    started = time.perf_counter()
+    profiler.enable()
+    try:
+        response = await call_next(request)
+    finally:
+        profiler.disable()
+        _active = False
+    elapsed = time.perf_counter() - started
+    if forced or elapsed >= PROFILE_THRESHOLD:
+        # Concurrent requests on the loop show up in the profile too; the route/intent in the
+        # file name identifies the request that was sampled. Load with pstats or snakeviz.
+        intent = getattr(request.state, "intent_name", None)
+        path = profile_path(request.url.path, intent, elapsed)
+        try:
+            os.makedirs(PROFILE_DIR, exist_ok=True)
+            profiler.dump_stats(path)
+            prune_profiles()
+            if forced:
+                response.headers["X-Profile-File"] = os.path.basename(path)
+        except OSError as e:
+            print(f"Failed to save profile: {e}")
+    return response
@@ -0,0 +1,201 @@
+import asyncio
+import base64
+import hmac
+import json
+import os
+import time
+from collections import OrderedDict
+from typing import Optional
+
+from pymongo import ReturnDocument
+
+from database import client, current_tenant, database
+
+# Token-bucket rules per path: (tokens refilled per second, bucket size, key source)
+RATE_LIMIT_RULES = {
+    "/webhook": (float(os.getenv("WEBHOOK_RATE", "2")), float(os.getenv("WEBHOOK_BURST", "10")), "session"),
+    "/ticket_booking/payment": (float(os.getenv("PAYMENT_RATE", "0.5")), float(os.getenv("PAYMENT_BURST", "5")), "email"),
+}
+# Number of reverse proxies in front of the app (1 on Vercel); X-Forwarded-For is ignored unless
+# this is set, and only the address the outermost trusted proxy saw is used
+TRUSTED_PROXY_HOPS = int(os.getenv("TRUSTED_PROXY_HOPS", "0"))
+# Per-IP ceiling on payments, so clients that rotate emails still share one bucket per address:
+# (tokens refilled per second, bucket size). It only applies when TRUSTED_PROXY_HOPS is set;
+# behind a proxy the peer address is the proxy's, and every customer would share one bucket.
+# /webhook has no ceiling: every call comes from Dialogflow's servers, so it is limited per
+# session, and sessions are only trusted when the webhook is authenticated (WEBHOOK_USER).
+IP_RATE_LIMIT_RULES = {
+    "/ticket_booking/payment": (float(os.getenv("PAYMENT_IP_RATE", "1.5")), float(os.getenv("PAYMENT_IP_BURST", "15"))),
+}
+# Basic auth credentials configured on the Dialogflow fulfillment; unset leaves /webhook open
+WEBHOOK_USER = os.getenv("WEBHOOK_USER")
+WEBHOOK_PASSWORD = os.getenv("WEBHOOK_PASSWORD", "")
+# "off" disables rate limiting and load shedding, e.g. for replay.py's in-process app
+RATE_LIMITING = os.getenv("RATE_LIMITING", "on") != "off"
+# "memory" keeps buckets per process, "mongo" shares them between instances
+RATE_LIMIT_BACKEND = os.getenv("RATE_LIMIT_BACKEND", "memory")
+MAX_TRACKED_KEYS = 50000
+
+# Load shedding thresholds, in seconds
+SHED_LOOP_LAG = float(os.getenv("SHED_LOOP_LAG_MS", "250")) / 1000
+SHED_MONGO_LATENCY = float(os.getenv("SHED_MONGO_LATENCY_MS", "1500")) / 1000
+MONITOR_INTERVAL = 0.5
+
+rate_limit_collection = database["rate_limits"]
+
+
+class MemoryBuckets:
+    def __init__(self, max_keys: int = MAX_TRACKED_KEYS):
+        self.max_keys = max_keys
+        self.buckets = OrderedDict()
+
+    async def take(self, key: str, rate: float, burst: float) -> Optional[float]:
+        # Returns None when a token was taken, otherwise the seconds until one is available
+        now = time.monotonic()
+        tokens, last = self.buckets.pop(key, (burst, now))
+        tokens = min(burst, tokens + (now - last) * rate)
+        allowed = tokens >= 1
+        if allowed:
+            tokens -= 1
+        self.buckets[key] = (tokens, now)
+        if len(self.buckets) > self.max_keys:
+            self.buckets.popitem(last=False)
+        return None if allowed else (1 - tokens) / rate
+
+
+class MongoBuckets:
+    def __init__(self, collection, fallback: MemoryBuckets):
+        self.collection = collection
+        self.fallback = fallback
+
+    async def take(self, key: str, rate: float, burst: float) -> Optional[float]:
+        # Refill and take in a single atomic pipeline update so instances never race
+        now = time.time()
+        try:
+            doc = await self.collection.find_one_and_update(
+                {"_id": key},
+                [
+                    {"$set": {
+                        "tokens": {"$min": [burst, {"$add": [
+                            {"$ifNull": ["$tokens", burst]},
+                            {"$multiply": [{"$subtract": [now, {"$ifNull": ["$ts", now]}]}, rate]},
+                        ]}]},
+                        "ts": now,
+                        "expireAt": {"$add": ["$$NOW", int(burst / rate * 1000) + 60000]},
+                    }},
+                    {"$set": {
+                        "allowed": {"$gte": ["$tokens", 1]},
+                        "tokens": {"$cond": [{"$gte": ["$tokens", 1]}, {"$subtract": ["$tokens", 1]}, "$tokens"]},
+                    }},
+                ],
+                upsert=True,
+                return_document=ReturnDocument.AFTER,
+            )
+        except Exception as e:
+            print(f"Rate limit store unavailable, using local buckets: {e}")
+            return await self.fallback.take(key, rate, burst)
+        return None if doc["allowed"] else (1 - doc["tokens"]) / rate
+
+
+class LoadMonitor:
+    def __init__(self, interval: float = MONITOR_INTERVAL):
+        self.interval = interval
+        self.loop_lag = 0.0
+        self.mongo_latency = 0.0
+        self.tasks = []
+
+    async def watch_loop(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            started = loop.time()
+            await asyncio.sleep(self.interval)
+            self.loop_lag = max(0.0, loop.time() - started - self.interval)
+
+    async def watch_mongo(self):
+        while True:
+            started = time.perf_counter()
+            try:
+                await asyncio.wait_for(client.admin.command("ping"), timeout=SHED_MONGO_LATENCY * 2)
+                self.mongo_latency = time.perf_counter() - started
+            except Exception:
+                self.mongo_latency = SHED_MONGO_LATENCY * 2
+            await asyncio.sleep(self.interval * 4)
+
+    def start(self):
+        if not self.tasks:
+            self.tasks = [asyncio.create_task(self.watch_loop()), asyncio.create_task(self.watch_mongo())]
+
+    def overloaded(self, path: str) -> bool:
+        # Payments keep flowing until the loop is twice as far behind as chat traffic tolerates.
+        # Only payments need a live write, so only they are shed on Mongo latency; chat turns go
+        # on to the circuit breakers and are answered from snapshots while Mongo is down.
+        if path == "/ticket_booking/payment":
+            return self.loop_lag > SHED_LOOP_LAG * 2 or self.mongo_latency > SHED_MONGO_LATENCY
+        return self.loop_lag > SHED_LOOP_LAG
+
+
+memory_buckets = MemoryBuckets()
+buckets = MongoBuckets(rate_limit_collection, memory_buckets) if RATE_LIMIT_BACKEND == "mongo" else memory_buckets
+load_monitor = LoadMonitor()
+
+
+async def ensure_rate_limit_indexes():
+    if RATE_LIMIT_BACKEND == "mongo":
+        await rate_limit_collection.create_index("expireAt", expireAfterSeconds=0)
+
+
+def client_ip(request) -> str:
+    peer = request.client.host if request.client else "unknown"
+    forwarded = request.headers.get("x-forwarded-for")
+    if not TRUSTED_PROXY_HOPS or not forwarded:
+        return peer
+    # Each proxy appends the address it received from; entries left of that are client-supplied
+    hops = [hop.strip() for hop in forwarded.split(",") if hop.strip()]
+    if len(hops) < TRUSTED_PROXY_HOPS:
+        return peer
+    return hops[-TRUSTED_PROXY_HOPS]
+
+
+def webhook_authorized(request) -> bool:
+    if not WEBHOOK_USER:
+        return True
+    expected = "Basic " + base64.b64encode(f"{WEBHOOK_USER}:{WEBHOOK_PASSWORD}".encode()).decode()
+    header = request.headers.get("authorization", "")
+    return hmac.compare_digest(header.encode(), expected.encode())
+
+
+async def rate_limit_key(request, source: str) -> str:
+    # The body is cached by the request, so the route handler can still read it
+    try:
+        body = json.loads(await request.body() or b"{}")
+    except ValueError:
+        body = {}
+    if source == "session" and body.get("session"):
+        return f"session:{body['session']}"
+    if source == "email" and body.get("email"):
+        return f"email:{str(body['email']).lower()}"
+    return f"ip:{client_ip(request)}"
+
+
+async def check_request(request):
+    # Returns (status_code, detail, retry_after) when the request should be rejected;
+    # retry_after is None when retrying won't help
+    path = request.url.path
+    rule = RATE_LIMIT_RULES.get(path)
+    if rule is None or not RATE_LIMITING:
+        return None
+    if path == "/webhook" and not webhook_authorized(request):
+        return 401, "Unauthorized.", None
+    if load_monitor.overloaded(path):
+        return 503, "Server is busy, please retry shortly.", 1
+    wait = None
+    if path in IP_RATE_LIMIT_RULES and TRUSTED_PROXY_HOPS:
+        ip_rate, ip_burst = IP_RATE_LIMIT_RULES[path]
+        wait = await buckets.take(f"{current_tenant.get()}|{path}|ceiling:{client_ip(request)}", ip_rate, ip_burst)
+    if wait is None:
+        rate, burst, source = rule
+        key = await rate_limit_key(request, source)
+        wait = await buckets.take(f"{current_tenant.get()}|{path}|{key}", rate, burst)
+    if wait is not None:
+        return 429, "Too many requests.", max(1, int(wait + 0.999))
+    return None
@@ -0,0 +1,127 @@
+import argparse
+import asyncio
+import json
+import os
+import time
+from collections import defaultdict
+
+import httpx
+from dotenv import dotenv_values
+
+# Replay captured traffic (see capture.py) against the in-process app or a running server:
+#   python replay.py capture.jsonl --mongodb-uri mongodb://localhost/replay --speed 10 --concurrency 50
+#   python replay.py capture.jsonl --target http://staging.example.com:8000
+# Replayed payments insert rows and decrement ticketsLeft, so the in-process app only runs
+# against the database given with --mongodb-uri, and always with the file mail transport.
+# Every in-process request comes from one client address, so rate limiting and load shedding
+# are off there unless --rate-limits is given; 429s are counted apart from errors either way.
+REPLAY_MAIL_DIR = "replay-outbox"
+
+
+def load_entries(path: str) -> list:
+    with open(path, encoding="utf-8") as f:
+        entries = [json.loads(line) for line in f if line.strip()]
+    entries.sort(key=lambda entry: entry["ts"])
+    return entries
+
+
+def label(entry: dict) -> str:
+    if entry["path"] == "/webhook":
+        intent = entry.get("intent") or entry["body"].get("queryResult", {}).get("intent", {}).get("displayName")
+        return intent or "unknown"
+    return entry["path"]
+
+
+def percentile(values: list, pct: float) -> float:
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100 * len(ordered))) - 1))
+    return ordered[index]
+
+
+def make_client(target, mongodb_uri=None, rate_limits=False):
+    if target:
+        return httpx.AsyncClient(base_url=target, timeout=30)
+    # These must be set before main (and database.py, which reads .env) is imported
+    os.environ["MONGODB_URI"] = mongodb_uri
+    os.environ["MAIL_TRANSPORT"] = "file"
+    os.environ.setdefault("MAIL_DIR", REPLAY_MAIL_DIR)
+    if not rate_limits:
+        os.environ["RATE_LIMITING"] = "off"
+    from main import app
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://replay", timeout=30)
+
+
+async def replay(entries: list, target=None, speed: float = 1.0, concurrency: int = 20, mongodb_uri=None,
+                 rate_limits: bool = False):
+    latencies = defaultdict(list)
+    errors = defaultdict(int)
+    throttled = defaultdict(int)
+    limit = asyncio.Semaphore(concurrency)
+    first = entries[0]["ts"]
+
+    async with make_client(target, mongodb_uri, rate_limits) as client:
+        started = time.perf_counter()
+
+        async def send(entry):
+            # Keep the captured spacing between requests, compressed by the speed factor
+            delay = (entry["ts"] - first) / speed - (time.perf_counter() - started)
+            if delay > 0:
+                await asyncio.sleep(delay)
+            headers = {"x-tenant": entry["tenant"]} if entry.get("tenant") else {}
+            async with limit:
+                sent = time.perf_counter()
+                try:
+                    response = await client.request(entry["method"], entry["path"], json=entry["body"], headers=headers)
+                    if response.status_code == 429:
+                        # The limiter answered, not the app; keep it out of the latencies
+                        throttled[label(entry)] += 1
+                        return
+                    if response.status_code >= 400:
+                        errors[label(entry)] += 1
+                except httpx.HTTPError:
+                    errors[label(entry)] += 1
+                latencies[label(entry)].append((time.perf_counter() - sent) * 1000)
+
+        await asyncio.gather(*(send(entry) for entry in entries))
+        elapsed = time.perf_counter() - started
+    return latencies, errors, throttled, elapsed
+
+
+def report(latencies: dict, errors: dict, throttled: dict, elapsed: float):
+    total = sum(len(values) for values in latencies.values()) + sum(throttled.values())
+    print(f"{total} requests in {elapsed:.2f}s ({total / elapsed:.1f} req/s), {sum(throttled.values())} rate limited")
+    print(f"{'intent':<28}{'count':>7}{'errors':>8}{'429':>6}{'p50 ms':>10}{'p90 ms':>10}{'p99 ms':>10}{'max ms':>10}")
+    names = set(latencies) | set(throttled)
+    for name in sorted(names, key=lambda n: -(len(latencies.get(n, [])) + throttled.get(n, 0))):
+        values = latencies.get(name)
+        timings = (f"{percentile(values, 50):>10.1f}{percentile(values, 90):>10.1f}"
+                   f"{percentile(values, 99):>10.1f}{max(values):>10.1f}") if values else f"{'-':>10}" * 4
+        print(f"{name:<28}{len(values or []):>7}{errors.get(name, 0):>8}{throttled.get(name, 0):>6}{timings}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Replay captured webhook and booking traffic")
+    parser.add_argument("capture", help="JSONL file written with CAPTURE_FILE")
+    parser.add_argument("--target", help="base URL of a running server (default: in-process app)")
+    parser.add_argument("--mongodb-uri", help="scratch database for the in-process app; replayed bookings are written to it")
+    parser.add_argument("--speed", type=float, default=1.0, help="replay speed factor, 1 to 50")
+    parser.add_argument("--concurrency", type=int, default=20, help="maximum requests in flight")
+    parser.add_argument("--rate-limits", action="store_true",
+                        help="keep rate limiting and load shedding on for the in-process app")
+    args = parser.parse_args(argv)
+    if not 1 <= args.speed <= 50:
+        parser.error("--speed must be between 1 and 50")
+    if not args.target:
+        if not args.mongodb_uri:
+            parser.error("replaying in-process writes bookings; pass --mongodb-uri for a scratch database or --target")
+        if args.mongodb_uri in (os.getenv("MONGODB_URI"), dotenv_values().get("MONGODB_URI")):
+            parser.error("--mongodb-uri must not be the configured MONGODB_URI")
+
+    entries = load_entries(args.capture)
+    if not entries:
+        parser.error("capture file is empty")
+    report(*asyncio.run(replay(entries, args.target, args.speed, args.concurrency, args.mongodb_uri, args.rate_limits)))
+
+
+if __name__ == "__main__":
+    main()
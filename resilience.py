@@ -0,0 +1,146 @@
+import asyncio
+import hashlib
+import json
+import os
+import time
+from typing import Awaitable, Callable, Optional, Tuple
+
+from pymongo.errors import ConnectionFailure, ExecutionTimeout
+
+from database import current_tenant
+
+# Hard deadline for a single Mongo operation; also sent to the server as maxTimeMS
+OPERATION_TIMEOUT = float(os.getenv("MONGO_OPERATION_TIMEOUT_MS", "2000")) / 1000
+OPERATION_TIMEOUT_MS = int(OPERATION_TIMEOUT * 1000)
+# Consecutive failures that open a breaker, and how long it stays open before a trial call
+BREAKER_FAILURES = int(os.getenv("BREAKER_FAILURES", "5"))
+BREAKER_RESET = float(os.getenv("BREAKER_RESET_SECONDS", "30"))
+SNAPSHOT_DIR = os.getenv("SNAPSHOT_DIR", "snapshots")
+# A snapshot is refreshed at most this often, so serializing it stays off most requests
+SNAPSHOT_INTERVAL = float(os.getenv("SNAPSHOT_INTERVAL_SECONDS", "30"))
+
+
+class CircuitOpen(Exception):
+    pass
+
+
+# Errors that mean the database is slow or unreachable; anything else is the caller's problem
+BREAKER_ERRORS = (asyncio.TimeoutError, ConnectionFailure, ExecutionTimeout)
+DATABASE_UNAVAILABLE = (CircuitOpen,) + BREAKER_ERRORS
+
+
+class CircuitBreaker:
+    def __init__(self, name: str, failures: int = BREAKER_FAILURES, reset: float = BREAKER_RESET):
+        self.name = name
+        self.max_failures = failures
+        self.reset = reset
+        self.failures = 0
+        self.opened_at = None
+        self.trial = False
+
+    def allow(self) -> bool:
+        if self.opened_at is None:
+            return True
+        # Half-open: after the reset period let exactly one call through to probe the database
+        if not self.trial and time.monotonic() - self.opened_at >= self.reset:
+            self.trial = True
+            return True
+        return False
+
+    def success(self):
+        self.failures = 0
+        self.opened_at = None
+        self.trial = False
+
+    def abandon(self):
+        # A call that never completed (e.g. cancelled on client disconnect) proves nothing either
+        # way; without this a cancelled trial would leave the breaker half-open for good
+        self.trial = False
+
+    def failure(self):
+        self.failures += 1
+        if self.trial or self.failures >= self.max_failures:
+            self.opened_at = time.monotonic()
+            self.trial = False
+            print(f"Circuit breaker opened for {self.name}")
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        return "half-open" if self.trial else "open"
+
+
+breakers = {}
+
+
+def breaker(collection: str) -> CircuitBreaker:
+    key = (current_tenant.get(), collection)
+    if key not in breakers:
+        breakers[key] = CircuitBreaker(f"{key[0]}.{collection}")
+    return breakers[key]
+
+
+async def guarded(collection: str, operation: Callable[[], Awaitable], timeout: float = OPERATION_TIMEOUT):
+    # Run one Mongo operation under the collection's breaker and a hard deadline
+    circuit = breaker(collection)
+    if not circuit.allow():
+        raise CircuitOpen(f"{collection} is unavailable")
+    try:
+        result = await asyncio.wait_for(operation(), timeout=timeout)
+    except BREAKER_ERRORS:
+        circuit.failure()
+        raise
+    except Exception:
+        # The database answered, even if with an error
+        circuit.success()
+        raise
+    except BaseException:
+        circuit.abandon()
+        raise
+    circuit.success()
+    return result
+
+
+class SnapshotStore:
+    # Last known good copies of read-path data, one JSON file per tenant and name
+    def __init__(self, directory: str = SNAPSHOT_DIR, interval: float = SNAPSHOT_INTERVAL):
+        self.directory = directory
+        self.interval = interval
+        self.digests = {}
+        self.checked = {}
+
+    def path(self, name: str) -> str:
+        return os.path.join(self.directory, current_tenant.get(), f"{name}.json")
+
+    def save(self, name: str, data):
+        path = self.path(name)
+        now = time.monotonic()
+        if now - self.checked.get(path, float("-inf")) < self.interval:
+            return
+        self.checked[path] = now
+        payload = json.dumps(data, ensure_ascii=False, default=str).encode("utf-8")
+        digest = hashlib.sha1(payload).hexdigest()
+        if self.digests.get(path) == digest:
+            return
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(payload)
+            os.replace(tmp_path, path)
+            self.digests[path] = digest
+        except OSError as e:
+            print(f"Failed to write snapshot {name}: {e}")
+
+    def load(self, name: str) -> Optional[Tuple[object, float]]:
+        # Returns (data, saved_at) or None when no snapshot exists
+        path = self.path(name)
+        try:
+            with open(path, encoding="utf-8") as f:
+                return json.load(f), os.path.getmtime(path)
+        except (OSError, ValueError):
+            return None
+
+
+snapshots = SnapshotStore()
@@ -0,0 +1,26 @@
+from functools import lru_cache
+from typing import List, Type
+
+from fastapi import Response
+from pydantic import BaseModel, TypeAdapter
+
+
+# Fetch only the fields a response model declares, validate them once, and serialize the
+# validated items directly. Returning a Response means FastAPI does not validate the same
+# documents a second time against response_model.
+@lru_cache(maxsize=None)
+def projection(model: Type[BaseModel]) -> dict:
+    fields = {name: 1 for name in model.model_fields}
+    fields["_id"] = 0
+    return fields
+
+
+@lru_cache(maxsize=None)
+def list_adapter(model: Type[BaseModel]) -> TypeAdapter:
+    return TypeAdapter(List[model])
+
+
+def validated_response(model: Type[BaseModel], docs: list, headers: dict = None) -> Response:
+    adapter = list_adapter(model)
+    return Response(content=adapter.dump_json(adapter.validate_python(docs)),
+                    media_type="application/json", headers=headers)
@@ -0,0 +1,161 @@
+import argparse
+import asyncio
+import os
+import re
+import time
+from datetime import datetime, timedelta
+from typing import Optional
+
+import pytz
+from pymongo import ASCENDING, UpdateOne
+
+from database import TENANTS, shows_collections, use_tenant
+from resilience import guarded
+from tenants import tenant_cache
+
+# Show dates and times are free-form strings; they are parsed into "startsAt" (UTC) so schedule
+# queries can use an index instead of fetching and filtering the whole catalog. "scheduledFrom"
+# keeps the strings startsAt was parsed from, so new and edited shows are found and re-parsed,
+# at startup and at most every SCHEDULE_REFRESH_SECONDS from /shows/search.
+SCHEDULE_REFRESH_SECONDS = float(os.getenv("SCHEDULE_REFRESH_SECONDS", "60"))
+SCHEDULE_TZ = pytz.timezone("Asia/Kolkata")
+DATE_FORMATS = [
+    "%Y-%m-%d", "%d-%m-%Y", "%d/%m/%Y", "%d.%m.%Y",
+    "%d %B %Y", "%d %b %Y", "%d %B, %Y", "%d %b, %Y",
+    "%B %d, %Y", "%b %d, %Y", "%B %d %Y", "%b %d %Y",
+    "%A, %B %d, %Y", "%a, %b %d, %Y", "%A %d %B %Y",
+]
+TIME_FORMATS = ["%I %p", "%I:%M %p", "%I%p", "%I:%M%p", "%H:%M", "%H.%M", "%I.%M %p"]
+_ORDINAL = re.compile(r"(\d+)(st|nd|rd|th)\b", re.IGNORECASE)
+_RANGE = re.compile(r"\s*(?:-|–|to)\s*", re.IGNORECASE)
+
+# Equality (location), then sort (startsAt), then range (ticketsLeft); id/title ride along so
+# /shows/search is answered from the index alone
+SCHEDULE_INDEXES = [
+    [("location", ASCENDING), ("startsAt", ASCENDING), ("ticketsLeft", ASCENDING), ("id", ASCENDING), ("title", ASCENDING)],
+    [("startsAt", ASCENDING), ("ticketsLeft", ASCENDING), ("location", ASCENDING), ("id", ASCENDING), ("title", ASCENDING)],
+]
+SCHEDULE_PROJECTION = {"_id": 0, "id": 1, "title": 1, "location": 1, "startsAt": 1, "ticketsLeft": 1}
+
+
+def parse_date(value: str):
+    value = _ORDINAL.sub(r"\1", " ".join(value.split()))
+    for fmt in DATE_FORMATS:
+        try:
+            return datetime.strptime(value, fmt).date()
+        except ValueError:
+            continue
+    return None
+
+
+def parse_time(value: str):
+    # "10 AM - 6 PM" opens at 10 AM
+    value = _RANGE.split(" ".join(value.split()), maxsplit=1)[0].upper().replace(".M.", "M").replace("A.M", "AM").replace("P.M", "PM")
+    for fmt in TIME_FORMATS:
+        try:
+            return datetime.strptime(value, fmt).time()
+        except ValueError:
+            continue
+    return None
+
+
+def parse_schedule(date: str, time: str) -> Optional[datetime]:
+    day = parse_date(date or "")
+    if day is None:
+        return None
+    start = parse_time(time or "") or datetime.min.time()
+    return SCHEDULE_TZ.localize(datetime.combine(day, start)).astimezone(pytz.UTC)
+
+
+def parse_query_date(value: Optional[str], end: bool = False) -> Optional[datetime]:
+    # Search bounds: dates and naive timestamps are venue-local like show times, so
+    # from=2024-09-14 starts at local midnight; a plain end date covers the whole day
+    if not value:
+        return None
+    parsed = datetime.fromisoformat(value)
+    if end and len(value) <= 10:
+        parsed += timedelta(days=1)
+    if parsed.tzinfo is None:
+        parsed = SCHEDULE_TZ.localize(parsed)
+    return parsed.astimezone(pytz.UTC)
+
+
+async def ensure_schedule_indexes():
+    for keys in SCHEDULE_INDEXES:
+        await shows_collections.create_index(keys)
+
+
+async def sync_schedule(full: bool = False) -> int:
+    # Parse startsAt for shows that are new or whose date/time changed since they were parsed
+    # (or for every show with full=True)
+    updates = []
+    async for show in shows_collections.find({}, {"date": 1, "time": 1, "startsAt": 1, "scheduledFrom": 1}):
+        source = {"date": show.get("date"), "time": show.get("time")}
+        if not full and "startsAt" in show and show.get("scheduledFrom") == source:
+            continue
+        starts_at = parse_schedule(source["date"], source["time"])
+        if starts_at is None:
+            print(f"Unparseable schedule for show {show['_id']}: {source['date']!r} {source['time']!r}")
+        # Matching on the strings too, so an edit made meanwhile isn't overwritten with stale times
+        updates.append(UpdateOne({"_id": show["_id"], **source}, {"$set": {"startsAt": starts_at, "scheduledFrom": source}}))
+    if updates:
+        await shows_collections.bulk_write(updates, ordered=False)
+    return len(updates)
+
+
+async def refresh_schedule():
+    # Picks up shows added or edited since startup for the current tenant; a failed refresh is
+    # logged and searched around, and retried after the next interval
+    cache = tenant_cache("schedule")
+    now = time.monotonic()
+    if now - cache.get("synced", float("-inf")) < SCHEDULE_REFRESH_SECONDS:
+        return
+    cache["synced"] = now
+    try:
+        await guarded("shows", sync_schedule)
+    except Exception as e:
+        print(f"Failed to refresh show schedules: {e}")
+
+
+async def prepare_schedules(full: bool = False) -> dict:
+    # Indexes and startsAt backfill for every tenant; a tenant whose database is unreachable
+    # is logged and skipped
+    updated = {}
+    for tenant in TENANTS:
+        with use_tenant(tenant):
+            try:
+                await ensure_schedule_indexes()
+                updated[tenant] = await sync_schedule(full)
+            except Exception as e:
+                print(f"Schedule setup failed for {tenant}: {e}")
+    return updated
+
+
+def search_query(start=None, end=None, location=None, min_tickets=None) -> dict:
+    starts_at = {"$ne": None}
+    if start:
+        starts_at["$gte"] = start
+    if end:
+        starts_at["$lt"] = end
+    query = {"startsAt": starts_at}
+    if location:
+        query["location"] = location
+    if min_tickets:
+        query["ticketsLeft"] = {"$gte": min_tickets}
+    return query
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Parse show dates into indexed startsAt fields")
+    parser.add_argument("--full", action="store_true", help="re-parse every show, not only new and edited ones")
+    args = parser.parse_args(argv)
+
+    async def run():
+        for tenant, count in (await prepare_schedules(args.full)).items():
+            print(f"Updated {count} shows for {tenant}")
+
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    main()
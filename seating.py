@@ -0,0 +1,358 @@
+import asyncio
+import math
+import os
+import time
+from bisect import bisect_right, insort
+from datetime import datetime, timedelta
+from typing import Iterable, List, Optional
+
+import pytz
+from pymongo.errors import BulkWriteError
+
+from database import TENANTS, payment_collection, seat_claims_collection, shows_collections, use_tenant
+from resilience import OPERATION_TIMEOUT_MS, guarded
+from tenants import tenant_cache
+
+# Optional seat layout stored on a show document; seats are numbered from 1 in layout order:
+#   "layout": {"sections": [
+#       {"name": "Stalls", "priority": 0, "rows": [{"name": "A", "seats": 20}, ...]},
+#       {"name": "Balcony", "priority": 1, "rows": [...]}
+#   ]}
+# Without one, the hall is rows of DEFAULT_ROW_LENGTH seats sized to the show's capacity.
+#
+# Every taken seat is a document in the tenant's seat_claims collection with
+# _id "<event ObjectId>:<seat>", so Mongo rejects a second claim on the same seat whichever
+# worker or instance makes it. Chat reservations hold seats with an expireAt; payments turn
+# a hold (or fresh seats) into "sold". The in-memory SeatMap only picks candidate seats.
+DEFAULT_ROW_LENGTH = 20
+# Rows about this far back in a section are preferred, nearer ones before farther ones
+PREFERRED_DEPTH = 0.4
+SEAT_MAP_TTL = 30
+SEAT_HOLD_SECONDS = int(os.getenv("SEAT_HOLD_SECONDS", "600"))
+# Allocation attempts when another worker claims the chosen seats first
+CLAIM_ATTEMPTS = 3
+
+
+class RowRuns:
+    # Free seats in one row as maximal runs: sorted run starts plus start -> length
+    def __init__(self, name: str, first: int, length: int):
+        self.name = name
+        self.first = first
+        self.length = length
+        self.center = first + (length - 1) / 2
+        self.starts = [first]
+        self.lengths = {first: length}
+        self.max_run = length
+
+    def free(self) -> int:
+        return sum(self.lengths.values())
+
+    def best_block(self, count: int) -> Optional[int]:
+        # First seat of the n-seat block closest to the row centre, or None if no run fits
+        if self.max_run < count:
+            return None
+        best, best_distance = None, None
+        for start in self.starts:
+            length = self.lengths[start]
+            if length < count:
+                continue
+            # Centre the block on the row centre, clamped to this run
+            first = min(max(start, round(self.center - (count - 1) / 2)), start + length - count)
+            distance = abs(first + (count - 1) / 2 - self.center)
+            if best is None or distance < best_distance:
+                best, best_distance = first, distance
+        return best
+
+    def take(self, first: int, count: int):
+        # Remove [first, first + count) from the run containing it, splitting the run
+        position = bisect_right(self.starts, first) - 1
+        if position < 0:
+            raise ValueError("Seats are not free")
+        start = self.starts[position]
+        end = start + self.lengths[start]
+        if first + count > end:
+            raise ValueError("Seats are not free")
+        del self.starts[position]
+        del self.lengths[start]
+        if first > start:
+            insort(self.starts, start)
+            self.lengths[start] = first - start
+        if first + count < end:
+            insort(self.starts, first + count)
+            self.lengths[first + count] = end - first - count
+        self.max_run = max(self.lengths.values(), default=0)
+
+
+class SeatMap:
+    def __init__(self, layout: dict, taken: Iterable[int] = ()):
+        self.rows: List[RowRuns] = []
+        ranked = []
+        seat = 1
+        for section in layout["sections"]:
+            section_rows = section["rows"]
+            depth = max(1, len(section_rows) - 1)
+            for index, row in enumerate(section_rows):
+                runs = RowRuns(f"{section.get('name', '')} {row.get('name', index + 1)}".strip(), seat, int(row["seats"]))
+                self.rows.append(runs)
+                offset = index / depth - PREFERRED_DEPTH
+                ranked.append((section.get("priority", 0), abs(offset) + (0.01 if offset > 0 else 0), len(self.rows) - 1))
+                seat += runs.length
+        self.capacity = seat - 1
+        self.row_firsts = [row.first for row in self.rows]
+        # Best rows first; fixed for the hall, so it is computed once
+        self.preference = [self.rows[i] for _, _, i in sorted(ranked)]
+        self.mark_taken(taken)
+
+    @classmethod
+    def for_event(cls, event: dict, taken: Iterable[int] = (), sold: Optional[int] = None):
+        # sold: seats paid for, when taken also includes unpaid holds
+        layout = event.get("layout")
+        if not layout:
+            taken = list(taken)
+            sold = len(taken) if sold is None else sold
+            capacity = (event.get("pricing") or {}).get("capacity") or int(event.get("ticketsLeft", 0)) + sold
+            # A sold-out show without a layout has no rows at all
+            rows = math.ceil(max(0, capacity) / DEFAULT_ROW_LENGTH)
+            layout = {"sections": [{"rows": [
+                {"name": chr(ord("A") + i) if i < 26 else str(i + 1),
+                 "seats": min(DEFAULT_ROW_LENGTH, capacity - i * DEFAULT_ROW_LENGTH)}
+                for i in range(rows)
+            ]}]}
+        return cls(layout, taken)
+
+    def row_of(self, seat: int) -> Optional[RowRuns]:
+        if not 1 <= seat <= self.capacity:
+            return None
+        return self.rows[bisect_right(self.row_firsts, seat) - 1]
+
+    def mark_taken(self, seats: Iterable[int]):
+        for seat in sorted(set(seats)):
+            row = self.row_of(seat)
+            if row is not None:
+                try:
+                    row.take(seat, 1)
+                except ValueError:
+                    pass
+
+    def is_free(self, seat: int) -> bool:
+        row = self.row_of(seat)
+        if row is None:
+            return False
+        position = bisect_right(row.starts, seat) - 1
+        return position >= 0 and seat < row.starts[position] + row.lengths[row.starts[position]]
+
+    def allocate(self, count: int) -> List[int]:
+        # Best contiguous block in the most preferred row that has one; otherwise the group is
+        # split over as few of the largest runs as possible
+        if count < 1:
+            return []
+        for row in self.preference:
+            first = row.best_block(count)
+            if first is not None:
+                row.take(first, count)
+                return list(range(first, first + count))
+        runs = sorted(((row.lengths[start], start, row) for row in self.preference for start in row.starts),
+                      key=lambda run: -run[0])
+        if sum(length for length, _, _ in runs) < count:
+            raise ValueError("Not enough seats left")
+        seats = []
+        for length, start, row in runs:
+            size = min(length, count - len(seats))
+            row.take(start, size)
+            seats.extend(range(start, start + size))
+            if len(seats) == count:
+                break
+        return seats
+
+
+def claim_id(event_id: str, seat: int) -> str:
+    return f"{event_id}:{seat}"
+
+
+async def ensure_seat_indexes():
+    # Per tenant: map rebuilds query by event, and expired holds are removed by a TTL index.
+    # Seat uniqueness itself comes from _id and needs no index to be created first.
+    for tenant in TENANTS:
+        with use_tenant(tenant):
+            try:
+                await seat_claims_collection.create_index("eventId")
+                await seat_claims_collection.create_index("paymentId", sparse=True)
+                await seat_claims_collection.create_index("expireAt", expireAfterSeconds=0)
+            except Exception as e:
+                print(f"Failed to create seat claim indexes for {tenant}: {e}")
+
+
+async def booked_seats(event_id: str) -> List[int]:
+    # Seats on payments, including ones made before seat claims existed
+    result = await guarded("payments", lambda: payment_collection.aggregate([
+        {"$match": {"eventId": event_id}},
+        {"$unwind": "$selectedSeats"},
+        {"$group": {"_id": None, "seats": {"$addToSet": "$selectedSeats"}}},
+    ], maxTimeMS=OPERATION_TIMEOUT_MS).to_list(1))
+    return result[0]["seats"] if result else []
+
+
+async def claimed_seats(event_id: str):
+    # (sold seats, unexpired held seats) from seat_claims
+    now = datetime.now(pytz.UTC)
+    claims = await guarded("seat_claims", lambda: seat_claims_collection.find(
+        {"eventId": event_id, "$or": [{"status": "sold"}, {"expireAt": {"$gt": now}}]},
+        {"_id": 0, "seat": 1, "status": 1},
+    ).max_time_ms(OPERATION_TIMEOUT_MS).to_list(None))
+    sold = {claim["seat"] for claim in claims if claim["status"] == "sold"}
+    return sold, {claim["seat"] for claim in claims} - sold
+
+
+async def current_tickets_left(event: dict) -> dict:
+    # A hall without a layout is sized from ticketsLeft plus the seats sold, so it needs
+    # today's count; the chat passes the show cached in its session, which can be long stale
+    if event.get("layout") or (event.get("pricing") or {}).get("capacity") or "_id" not in event:
+        return event
+    show = await guarded("shows", lambda: shows_collections.find_one(
+        {"_id": event["_id"]}, {"ticketsLeft": 1}, max_time_ms=OPERATION_TIMEOUT_MS))
+    return {**event, "ticketsLeft": show.get("ticketsLeft", 0)} if show else event
+
+
+async def get_seat_map(event_id: str, event: dict) -> SeatMap:
+    # Seat maps live per tenant and event and are rebuilt from Mongo when they expire or a
+    # claim conflicts; they only suggest seats, the claim insert decides
+    cache = tenant_cache("seating")
+    cached = cache.get(event_id)
+    if cached is not None and time.monotonic() - cached[0] < SEAT_MAP_TTL:
+        return cached[1]
+    event = await current_tickets_left(event)
+    sold, held = await claimed_seats(event_id)
+    sold |= set(await booked_seats(event_id))
+    seat_map = SeatMap.for_event(event, sold | held, len(sold))
+    cache[event_id] = (time.monotonic(), seat_map)
+    return seat_map
+
+
+def forget_seat_map(event_id: str):
+    tenant_cache("seating").pop(event_id, None)
+
+
+def seat_lock(event_id: str) -> asyncio.Lock:
+    locks = tenant_cache("seat_locks")
+    if event_id not in locks:
+        locks[event_id] = asyncio.Lock()
+    return locks[event_id]
+
+
+async def insert_claims(event_id: str, seats: List[int], fields: dict, retry: bool = True) -> List[int]:
+    # Claims every seat or none; returns the seats someone else already holds
+    docs = [{"_id": claim_id(event_id, seat), "eventId": event_id, "seat": seat, **fields} for seat in seats]
+    try:
+        await guarded("seat_claims", lambda: seat_claims_collection.insert_many(docs, ordered=False))
+        return []
+    except BulkWriteError as e:
+        errors = e.details.get("writeErrors", [])
+        failed = {docs[error["index"]]["_id"] for error in errors}
+        inserted = [doc["_id"] for doc in docs if doc["_id"] not in failed]
+        if inserted:
+            await guarded("seat_claims", lambda: seat_claims_collection.delete_many({"_id": {"$in": inserted}}))
+        if any(error.get("code") != 11000 for error in errors):
+            raise
+    conflicts = [doc for doc in docs if doc["_id"] in failed]
+    # Holds past their expiry may not have been removed by the TTL monitor yet
+    expired = await guarded("seat_claims", lambda: seat_claims_collection.delete_many({
+        "_id": {"$in": [doc["_id"] for doc in conflicts]},
+        "status": "held",
+        "expireAt": {"$lte": datetime.now(pytz.UTC)},
+    }))
+    if retry and expired.deleted_count:
+        return await insert_claims(event_id, seats, fields, retry=False)
+    return [doc["seat"] for doc in conflicts]
+
+
+async def claim_best(event_id: str, event: dict, count: int, fields: dict) -> List[int]:
+    # Best available block, claimed in Mongo; ValueError when the show can't seat the group
+    async with seat_lock(event_id):
+        for _ in range(CLAIM_ATTEMPTS):
+            seat_map = await get_seat_map(event_id, event)
+            seats = seat_map.allocate(count)
+            conflicts = await insert_claims(event_id, seats, fields)
+            if not conflicts:
+                return seats
+            # Another worker got there first; rebuild the map from Mongo and choose again
+            forget_seat_map(event_id)
+        raise ValueError("Seats are being booked concurrently, please retry")
+
+
+def sold_fields(email: str, payment_id) -> dict:
+    # Sold claims carry the payment's _id, chosen before the payment is written, so a failed
+    # payment releases exactly its own seats
+    return {"status": "sold", "email": email.lower(), "paymentId": payment_id}
+
+
+async def allocate_seats(event_id: str, event: dict, count: int, email: str, payment_id) -> List[int]:
+    return await claim_best(event_id, event, count, sold_fields(email, payment_id))
+
+
+async def claim_seats(event_id: str, event: dict, seats: List[int], email: str, payment_id) -> bool:
+    # Client-picked seats, all or nothing; False if any of them is taken or not in the hall.
+    # Seats sold before seat claims existed are only on payments, so the claim insert can't
+    # catch them and the map has to.
+    async with seat_lock(event_id):
+        seat_map = await get_seat_map(event_id, event)
+        if not all(seat_map.is_free(seat) for seat in seats):
+            # The cached map may predate a released hold; decide on a fresh one
+            forget_seat_map(event_id)
+            seat_map = await get_seat_map(event_id, event)
+            if not all(seat_map.is_free(seat) for seat in seats):
+                return False
+        if await insert_claims(event_id, seats, sold_fields(email, payment_id)):
+            forget_seat_map(event_id)
+            return False
+        seat_map.mark_taken(seats)
+        return True
+
+
+async def hold_seats(event_id: str, event: dict, count: int, email: str, session_id: str) -> List[int]:
+    # Chat reservation: replaces the session's earlier hold with a fresh one that expires
+    # after SEAT_HOLD_SECONDS unless a payment from the same email takes it over
+    await release_hold(session_id)
+    expire_at = datetime.now(pytz.UTC) + timedelta(seconds=SEAT_HOLD_SECONDS)
+    return await claim_best(event_id, event, count, {
+        "status": "held", "email": email.lower(), "session": session_id, "expireAt": expire_at,
+    })
+
+
+async def release_hold(session_id: str):
+    if session_id:
+        await guarded("seat_claims", lambda: seat_claims_collection.delete_many({"session": session_id, "status": "held"}))
+
+
+async def take_hold(event_id: str, email: str, count: int, seats: Optional[List[int]], payment_id) -> Optional[dict]:
+    # Sells this email's unexpired hold for the event to the payment when it matches (same
+    # count, and the same seats if the client picked any); returns
+    # {"seats": [...], "session": ...} or None
+    holds = await guarded("seat_claims", lambda: seat_claims_collection.find({
+        "eventId": event_id, "status": "held", "email": email.lower(),
+        "expireAt": {"$gt": datetime.now(pytz.UTC)},
+    }, {"seat": 1, "session": 1}).max_time_ms(OPERATION_TIMEOUT_MS).to_list(None))
+    held = sorted(hold["seat"] for hold in holds)
+    if not held:
+        return None
+    if len(held) != count or (seats and sorted(seats) != held):
+        # The customer is paying for something else; free the hold so it can't block their picks
+        await guarded("seat_claims", lambda: seat_claims_collection.delete_many(
+            {"_id": {"$in": [hold["_id"] for hold in holds]}, "status": "held"}))
+        forget_seat_map(event_id)
+        return None
+    ids = [hold["_id"] for hold in holds]
+    result = await guarded("seat_claims", lambda: seat_claims_collection.update_many(
+        {"_id": {"$in": ids}, "status": "held", "email": email.lower()},
+        {"$set": {"status": "sold", "paymentId": payment_id}, "$unset": {"expireAt": "", "session": ""}},
+    ))
+    if result.modified_count != len(ids):
+        # Part of the hold lapsed in between; give back what was converted and allocate anew
+        await release_seats(event_id, payment_id)
+        return None
+    return {"seats": held, "session": holds[0].get("session")}
+
+
+async def release_seats(event_id: str, payment_id):
+    # Undo the seats claimed for a payment that did not go through
+    await guarded("seat_claims", lambda: seat_claims_collection.delete_many({"paymentId": payment_id}))
+    forget_seat_map(event_id)
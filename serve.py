@@ -0,0 +1,104 @@
+import argparse
+import asyncio
+import multiprocessing
+import os
+import tempfile
+import time
+
+# Multi-worker serving: one refresher process polls Mongo and publishes the shows catalog,
+# price tables and compiled locale menus to a shared mapped file; every uvicorn worker reads
+# that file instead of polling the database itself.
+#   python serve.py --workers 4 --port 8000
+REFRESH_SECONDS = float(os.getenv("SHARED_CATALOG_REFRESH_SECONDS", "15"))
+
+
+async def build_tenant(tenant: str) -> dict:
+    # Database modules are imported inside the refresher so the parent never opens a
+    # Mongo client before uvicorn forks its workers
+    from database import current_tenant, shows_collections
+    from menus import LOCALE_MENUS, render_ticket_menu
+    from model import Shows
+    from pricing import PriceBook, price_rows
+    from resilience import OPERATION_TIMEOUT_MS, guarded
+
+    current_tenant.set(tenant)
+    docs = await guarded("shows", lambda: shows_collections.find({}).max_time_ms(OPERATION_TIMEOUT_MS).to_list(None))
+    pricing = await price_rows(docs)
+    prices = PriceBook(pricing).unit_prices()
+    return {
+        # Same shape and limit as /shows after response_model filtering
+        "shows": [Shows.model_validate(doc).model_dump(mode="json") for doc in docs[:100]],
+        "pricing": pricing,
+        "menus": {locale: render_ticket_menu(locale, prices) for locale in LOCALE_MENUS},
+    }
+
+
+async def refresh_forever(path: str, interval: float):
+    from database import TENANTS
+    from shared_catalog import publish
+
+    published, refreshed = {}, {}
+    while True:
+        for tenant in TENANTS:
+            try:
+                published[tenant] = await build_tenant(tenant)
+                refreshed[tenant] = time.time()
+            except Exception as e:
+                # Keep the previous copy for this tenant; workers stop using it once it is
+                # older than SHARED_CATALOG_MAX_AGE
+                print(f"Catalog refresh failed for {tenant}: {e}")
+        if published:
+            publish(path, published, refreshed)
+        await asyncio.sleep(interval)
+
+
+def run_refresher(path: str, interval: float):
+    asyncio.run(refresh_forever(path, interval))
+
+
+def default_path() -> str:
+    directory = "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir()
+    return os.path.join(directory, f"ticketing-catalog-{os.getpid()}")
+
+
+def wait_for_snapshot(path: str, timeout: float = 30):
+    deadline = time.monotonic() + timeout
+    while not os.path.exists(path):
+        if time.monotonic() > deadline:
+            print("No catalog snapshot yet; workers will fall back to the database")
+            return
+        time.sleep(0.1)
+
+
+def main(argv=None):
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Serve the API with several workers and a shared catalog")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--refresh", type=float, default=REFRESH_SECONDS, help="seconds between catalog refreshes")
+    parser.add_argument("--catalog-path", default=None, help="shared snapshot file (default: under /dev/shm)")
+    args = parser.parse_args(argv)
+
+    path = args.catalog_path or default_path()
+    # Workers inherit the environment and map the snapshot published by the refresher. This
+    # process must not import shared_catalog first: with --workers 1 uvicorn serves the app
+    # in-process and would reuse a module loaded before the path was set.
+    os.environ["SHARED_CATALOG_PATH"] = path
+    os.environ["SHARED_CATALOG_REFRESH_SECONDS"] = str(args.refresh)
+    refresher = multiprocessing.Process(target=run_refresher, args=(path, args.refresh), daemon=True)
+    refresher.start()
+    wait_for_snapshot(path)
+    try:
+        uvicorn.run("main:app", host=args.host, port=args.port, workers=args.workers)
+    finally:
+        refresher.terminate()
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+if __name__ == "__main__":
+    main()
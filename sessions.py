@@ -0,0 +1,79 @@
+import os
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+
+import pytz
+
+from database import TENANTS, current_tenant, sessions_collection, use_tenant
+
+# Conversation state per Dialogflow session: chosen locale, resolved event, pending quantity
+SESSION_TTL = float(os.getenv("SESSION_TTL_SECONDS", "1800"))
+SESSION_MAX = int(os.getenv("SESSION_MAX", "20000"))
+# "memory" keeps sessions per process, "mongo" also writes them through to the sessions collection
+SESSION_BACKEND = os.getenv("SESSION_BACKEND", "memory")
+
+
+class SessionStore:
+    def __init__(self, collection=None, ttl: float = SESSION_TTL, max_sessions: int = SESSION_MAX):
+        self.collection = collection
+        self.ttl = ttl
+        self.max_sessions = max_sessions
+        self.sessions = OrderedDict()
+
+    def key(self, session_id: str):
+        return current_tenant.get(), session_id
+
+    async def get(self, session_id: str) -> dict:
+        # Returns the live state dict; callers mutate it and call save()
+        if not session_id:
+            return {}
+        key = self.key(session_id)
+        entry = self.sessions.get(key)
+        now = time.monotonic()
+        if entry is not None and entry[0] > now:
+            self.sessions.move_to_end(key)
+            return entry[1]
+        self.sessions.pop(key, None)
+        state = {}
+        if self.collection is not None:
+            try:
+                doc = await self.collection.find_one({"_id": session_id}, {"_id": 0, "expireAt": 0})
+                state = doc or {}
+            except Exception as e:
+                print(f"Session store unavailable: {e}")
+        self.put(key, state, now)
+        return state
+
+    def put(self, key, state: dict, now: float):
+        self.sessions[key] = (now + self.ttl, state)
+        self.sessions.move_to_end(key)
+        while len(self.sessions) > self.max_sessions:
+            self.sessions.popitem(last=False)
+
+    async def save(self, session_id: str, state: dict):
+        if not session_id:
+            return
+        self.put(self.key(session_id), state, time.monotonic())
+        if self.collection is not None:
+            expire_at = datetime.now(pytz.UTC) + timedelta(seconds=self.ttl)
+            try:
+                await self.collection.replace_one(
+                    {"_id": session_id}, {**state, "expireAt": expire_at}, upsert=True
+                )
+            except Exception as e:
+                print(f"Failed to persist session: {e}")
+
+    async def ensure_indexes(self):
+        # Every tenant's sessions collection needs its own TTL index
+        if self.collection is None:
+            return
+        for tenant in TENANTS:
+            with use_tenant(tenant):
+                try:
+                    await self.collection.create_index("expireAt", expireAfterSeconds=0)
+                except Exception as e:
+                    print(f"Failed to create session TTL index for {tenant}: {e}")
+
+
+session_store = SessionStore(sessions_collection if SESSION_BACKEND == "mongo" else None)
@@ -0,0 +1,116 @@
+import json
+import mmap
+import os
+import struct
+import time
+
+# Read-only catalog snapshot shared by all workers through one memory-mapped file.
+# Layout: header (magic, version, index length) | JSON index | blobs. The index maps
+# tenant -> {name: [offset, length]} into the blob area, so a worker can hand out a
+# pre-encoded /shows body without parsing it, and records when each tenant was last
+# refreshed from Mongo.
+SHARED_CATALOG_PATH = os.getenv("SHARED_CATALOG_PATH")
+SHARED_CATALOG_CHECK = 0.5
+# A tenant's copy older than this is ignored and requests go to Mongo (or its stale
+# snapshot) instead, e.g. when the refresher has died or can't reach that tenant
+SHARED_CATALOG_MAX_AGE = float(os.getenv("SHARED_CATALOG_MAX_AGE")
+                               or 4 * float(os.getenv("SHARED_CATALOG_REFRESH_SECONDS", "15")))
+MAGIC = b"TKTCAT02"
+HEADER = struct.Struct("<8sQQ")
+
+
+def publish(path: str, tenants: dict, refreshed: dict = None, version: int = None) -> int:
+    # tenants: {tenant: {name: json-serializable value}}, refreshed: {tenant: epoch seconds},
+    # defaulting to now; replaced atomically so readers either keep the old mapping or see
+    # the complete new one
+    version = version or time.time_ns()
+    refreshed = refreshed or {tenant: version / 1e9 for tenant in tenants}
+    parts_index, blobs, offset = {}, [], 0
+    for tenant, parts in tenants.items():
+        parts_index[tenant] = {}
+        for name, value in parts.items():
+            blob = json.dumps(value, ensure_ascii=False, default=str).encode("utf-8")
+            parts_index[tenant][name] = [offset, len(blob)]
+            blobs.append(blob)
+            offset += len(blob)
+    index = {"parts": parts_index, "refreshed": refreshed}
+    index_bytes = json.dumps(index).encode("utf-8")
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, version, len(index_bytes)))
+        f.write(index_bytes)
+        for blob in blobs:
+            f.write(blob)
+    os.replace(tmp_path, path)
+    return version
+
+
+class CatalogView:
+    def __init__(self, mapped: mmap.mmap, max_age: float = SHARED_CATALOG_MAX_AGE):
+        magic, self.version, index_length = HEADER.unpack_from(mapped, 0)
+        if magic != MAGIC:
+            raise ValueError("Not a catalog snapshot")
+        start = HEADER.size
+        index = json.loads(mapped[start:start + index_length])
+        self.index = index["parts"]
+        self.refreshed = index["refreshed"]
+        self.max_age = max_age
+        self.base = start + index_length
+        self.mapped = mapped
+        self.decoded = {}
+
+    def fresh(self, tenant: str) -> bool:
+        refreshed = self.refreshed.get(tenant)
+        return refreshed is not None and time.time() - refreshed <= self.max_age
+
+    def raw(self, tenant: str, name: str):
+        # Encoded JSON straight out of the shared mapping; None once the tenant's copy is stale
+        location = self.index.get(tenant, {}).get(name)
+        if location is None or not self.fresh(tenant):
+            return None
+        offset, length = location
+        return self.mapped[self.base + offset:self.base + offset + length]
+
+    def get(self, tenant: str, name: str):
+        # Decoded once per worker and snapshot version
+        if not self.fresh(tenant):
+            return None
+        key = (tenant, name)
+        if key not in self.decoded:
+            raw = self.raw(tenant, name)
+            self.decoded[key] = None if raw is None else json.loads(raw)
+        return self.decoded[key]
+
+
+class SharedCatalog:
+    def __init__(self, path: str, check_interval: float = SHARED_CATALOG_CHECK, max_age: float = SHARED_CATALOG_MAX_AGE):
+        self.path = path
+        self.check_interval = check_interval
+        self.max_age = max_age
+        self.checked = 0.0
+        self.identity = None
+        self.view = None
+
+    def current(self):
+        # Remaps only when the refresher has replaced the file
+        now = time.monotonic()
+        if now - self.checked < self.check_interval:
+            return self.view
+        self.checked = now
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return self.view
+        identity = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        if identity != self.identity:
+            try:
+                with open(self.path, "rb") as f:
+                    mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                self.view = CatalogView(mapped, self.max_age)
+                self.identity = identity
+            except (OSError, ValueError, KeyError, struct.error) as e:
+                print(f"Failed to map shared catalog: {e}")
+        return self.view
+
+
+shared_catalog = SharedCatalog(SHARED_CATALOG_PATH) if SHARED_CATALOG_PATH else None
@@ -0,0 +1,47 @@
+import json
+
+from database import DEFAULT_TENANT, TENANTS, current_tenant
+
+# Reverse lookups built once from the TENANTS configuration
+TENANT_BY_HOST = {host.lower(): tenant for tenant, conf in TENANTS.items() for host in conf.get("hosts", [])}
+TENANT_BY_AGENT = {agent: tenant for tenant, conf in TENANTS.items() for agent in conf.get("agents", [])}
+
+# Per-tenant caches: {(tenant, namespace): {...}}
+tenant_caches = {}
+
+
+def tenant_cache(namespace: str) -> dict:
+    # Cache dict private to the current tenant, so catalog/menu data never leaks between venues
+    key = (current_tenant.get(), namespace)
+    cache = tenant_caches.get(key)
+    if cache is None:
+        cache = tenant_caches[key] = {}
+    return cache
+
+
+def agent_from_session(session: str):
+    # Dialogflow sessions look like "projects/<agent-project>/agent/sessions/<id>"
+    parts = session.split("/")
+    if len(parts) > 1 and parts[0] == "projects":
+        return parts[1]
+    return None
+
+
+async def resolve_tenant(request) -> str:
+    # Explicit header first, then the Host, then the Dialogflow agent that sent the webhook;
+    # unknown values fall back to the default tenant so arbitrary input can't open new databases
+    tenant = request.headers.get("x-tenant")
+    if tenant in TENANTS:
+        return tenant
+    host = request.headers.get("host", "").split(":")[0].lower()
+    if host in TENANT_BY_HOST:
+        return TENANT_BY_HOST[host]
+    if TENANT_BY_AGENT and request.url.path == "/webhook":
+        try:
+            body = json.loads(await request.body() or b"{}")
+        except ValueError:
+            body = {}
+        agent = agent_from_session(str(body.get("session", "")))
+        if agent in TENANT_BY_AGENT:
+            return TENANT_BY_AGENT[agent]
+    return DEFAULT_TENANT
@@ -0,0 +1,67 @@
+import json
+
+import pytest
+
+from faq_engine import FAQ_FILE, FaqEngine
+
+with open(FAQ_FILE, encoding="utf-8") as f:
+    ENTRIES = json.load(f)
+KEYS = [entry["key"] for entry in ENTRIES]
+ENGINE = FaqEngine(ENTRIES)
+
+# Realistic rewordings of the shipped FAQs, none of which is an alias in faq.json
+PARAPHRASES = [
+    ("what are the museum timings", "museum"),
+    ("when does the museum open", "museum"),
+    ("what are your opening hours", "museum"),
+    ("is the museum open today", "museum"),
+    ("museum timing", "museum"),
+    ("संग्रहालय का समय क्या है", "museum"),
+    ("where is the museum located", "location"),
+    ("what is the address", "location"),
+    ("museum address", "location"),
+    ("location of the museum", "location"),
+    ("संग्रहालय का पता", "location"),
+    ("tell me about the museum", "about"),
+    ("what is in the collection", "about"),
+    ("museum collection", "about"),
+    ("what is modern maestro", "modern maestro"),
+    ("tell me about the modern maestro exhibit", "modern maestro"),
+    ("modern maestros", "modern maestro"),
+    ("what is stories untold", "stories untold"),
+    ("tell me about stories untold", "stories untold"),
+    ("tell me about art through the ages", "art through the ages"),
+    ("art through ages", "art through the ages"),
+    ("timeless treasure exhibit", "timeless treasures"),
+    ("what are timeless treasures", "timeless treasures"),
+]
+
+
+@pytest.mark.parametrize("query,key", PARAPHRASES)
+def test_paraphrases_resolve_to_their_entry(query, key):
+    found = ENGINE.match(query)
+    assert found is not None
+    assert KEYS[found[0]] == key
+
+
+def test_exact_question_in_any_language():
+    entry_id, lang, score = ENGINE.match("संग्रहालय कब खुलता है")
+    assert (KEYS[entry_id], lang, score) == ("museum", "hi", 1.0)
+    assert ENGINE.answer("संग्रहालय कब खुलता है") == ENTRIES[0]["answers"]["hi"]
+    assert ENGINE.answer("संग्रहालय कब खुलता है", "en") == ENTRIES[0]["answers"]["en"]
+
+
+def test_typos_still_match():
+    entry_id, _, _ = ENGINE.match("timless tresures")
+    assert KEYS[entry_id] == "timeless treasures"
+
+
+@pytest.mark.parametrize("query", ["how do I get a refund", "parking", "the", "what"])
+def test_unrelated_questions_fall_back(query):
+    assert ENGINE.match(query) is None
+    assert ENGINE.answer(query, "hi") == "क्षमा करें, मेरे पास इस विषय पर जानकारी नहीं है।"
+
+
+def test_shared_words_weigh_less_than_distinctive_ones():
+    # "museum" appears in several entries, "timings" only in one
+    assert ENGINE.word_weight("museum") < ENGINE.word_weight("timings")
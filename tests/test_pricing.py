@@ -0,0 +1,67 @@
+import asyncio
+from datetime import datetime
+
+import pricing
+from pricing import PRICING_TZ, PriceBook
+
+NOON = PRICING_TZ.localize(datetime(2024, 9, 14, 12))
+EVENING = PRICING_TZ.localize(datetime(2024, 9, 14, 18))
+
+
+def book(**rules):
+    return PriceBook([{"id": "show", "price_int": 100, "ticketsLeft": 50, "capacity": 100, "pricing": rules}])
+
+
+def test_group_discount_applies_from_its_tier():
+    prices = book(groupDiscounts=[[25, 0.15], [10, 0.10]])
+    assert prices.quote_many(["show"], [9, 10, 25], NOON) == {"show": [900, 900, 2125]}
+
+
+def test_time_of_day_uses_venue_hours():
+    prices = book(timeOfDay=[[17, 21, 1.2]])
+    assert prices.quote("show", 1, NOON) == 100
+    assert prices.quote("show", 1, EVENING) == 120
+    # 12:30 UTC is 18:00 at the venue
+    assert prices.quote("show", 1, EVENING.astimezone(pricing.pytz.UTC)) == 120
+
+
+def test_surge_uses_the_scarcest_matching_tier():
+    shows = [
+        {"id": "half", "price_int": 100, "ticketsLeft": 50, "capacity": 100},
+        {"id": "low", "price_int": 100, "ticketsLeft": 15, "capacity": 100},
+        {"id": "last", "price_int": 100, "ticketsLeft": 5, "capacity": 100},
+    ]
+    for show in shows:
+        show["pricing"] = {"surge": [[0.2, 1.25], [0.1, 1.5]]}
+    assert PriceBook(shows).unit_prices(NOON) == {"half": 100, "low": 125, "last": 150}
+
+
+def test_unknown_events_are_not_quoted():
+    assert book().quote("missing", 1, NOON) is None
+
+
+def test_price_rows_take_capacity_from_the_layout():
+    layout = {"sections": [{"rows": [{"seats": 20}, {"seats": 30}]}]}
+    rows = asyncio.run(pricing.price_rows([{"_id": "a", "id": "show", "price_int": 100, "ticketsLeft": 5, "layout": layout}]))
+    assert rows[0]["capacity"] == 50
+    assert PriceBook(rows).multipliers(NOON) == [1.0]
+
+
+def test_price_rows_size_other_shows_from_sales(monkeypatch):
+    asked = []
+
+    async def sold_counts(event_ids):
+        asked.extend(event_ids)
+        return {"b": 95}
+
+    monkeypatch.setattr(pricing, "sold_counts", sold_counts)
+    shows = [
+        {"_id": "a", "id": "sized", "ticketsLeft": 5, "pricing": {"capacity": 200}},
+        {"_id": "b", "id": "unsized", "ticketsLeft": 5, "pricing": {"surge": [[0.1, 1.5]]}},
+    ]
+    rows = asyncio.run(pricing.price_rows(shows))
+    # Only shows without a configured size need their sales counted
+    assert asked == ["b"]
+    assert rows[1]["capacity"] == 100
+    prices = PriceBook([{**row, "price_int": 100} for row in rows])
+    assert prices.unit_prices(NOON) == {"sized": 100, "unsized": 150}
@@ -0,0 +1,63 @@
+import asyncio
+from types import SimpleNamespace
+
+import ratelimit
+from ratelimit import MemoryBuckets
+
+
+def take(buckets, key, rate=1.0, burst=3.0):
+    return asyncio.run(buckets.take(key, rate, burst))
+
+
+def test_bucket_allows_a_burst_then_reports_the_wait(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(ratelimit.time, "monotonic", lambda: now[0])
+    buckets = MemoryBuckets()
+    assert [take(buckets, "a") for _ in range(3)] == [None, None, None]
+    assert take(buckets, "a") == 1.0
+    # Other keys have their own bucket
+    assert take(buckets, "b") is None
+    now[0] += 0.5
+    assert take(buckets, "a") == 0.5
+    now[0] += 0.5
+    assert take(buckets, "a") is None
+
+
+def test_bucket_refills_no_further_than_the_burst(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(ratelimit.time, "monotonic", lambda: now[0])
+    buckets = MemoryBuckets()
+    take(buckets, "a")
+    now[0] += 3600
+    assert [take(buckets, "a") for _ in range(4)] == [None, None, None, 1.0]
+
+
+def test_least_recently_used_keys_are_evicted(monkeypatch):
+    monkeypatch.setattr(ratelimit.time, "monotonic", lambda: 100.0)
+    buckets = MemoryBuckets(max_keys=2)
+    for _ in range(3):
+        take(buckets, "a")
+    take(buckets, "b")
+    take(buckets, "a")
+    take(buckets, "c")
+    assert list(buckets.buckets) == ["a", "c"]
+
+
+def request(peer, forwarded=None):
+    headers = {"x-forwarded-for": forwarded} if forwarded else {}
+    return SimpleNamespace(client=SimpleNamespace(host=peer), headers=headers)
+
+
+def test_forwarded_for_is_ignored_without_trusted_proxies(monkeypatch):
+    monkeypatch.setattr(ratelimit, "TRUSTED_PROXY_HOPS", 0)
+    assert ratelimit.client_ip(request("10.0.0.1", "1.2.3.4")) == "10.0.0.1"
+
+
+def test_client_ip_is_the_address_the_outermost_proxy_saw(monkeypatch):
+    monkeypatch.setattr(ratelimit, "TRUSTED_PROXY_HOPS", 1)
+    # The client put 6.6.6.6 there itself; the proxy appended the real address
+    assert ratelimit.client_ip(request("10.0.0.1", "6.6.6.6, 1.2.3.4")) == "1.2.3.4"
+    assert ratelimit.client_ip(request("10.0.0.1")) == "10.0.0.1"
+    monkeypatch.setattr(ratelimit, "TRUSTED_PROXY_HOPS", 2)
+    assert ratelimit.client_ip(request("10.0.0.1", "6.6.6.6, 1.2.3.4, 10.0.0.9")) == "1.2.3.4"
+    assert ratelimit.client_ip(request("10.0.0.1", "1.2.3.4")) == "10.0.0.1"
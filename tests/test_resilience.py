@@ -0,0 +1,97 @@
+import asyncio
+
+import pytest
+
+import resilience
+from resilience import CircuitBreaker, CircuitOpen
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(resilience.time, "monotonic", clock)
+    return clock
+
+
+def test_breaker_opens_after_consecutive_failures(clock):
+    circuit = CircuitBreaker("test", failures=3, reset=30)
+    circuit.failure()
+    circuit.failure()
+    circuit.success()
+    circuit.failure()
+    circuit.failure()
+    assert circuit.allow()
+    circuit.failure()
+    assert circuit.state == "open"
+    assert not circuit.allow()
+
+
+def test_half_open_breaker_lets_one_trial_through(clock):
+    circuit = CircuitBreaker("test", failures=1, reset=30)
+    circuit.failure()
+    clock.now += 29
+    assert not circuit.allow()
+    clock.now += 1
+    assert circuit.allow()
+    assert circuit.state == "half-open"
+    assert not circuit.allow()
+
+
+def test_failed_trial_reopens_and_successful_trial_closes(clock):
+    circuit = CircuitBreaker("test", failures=5, reset=30)
+    for _ in range(5):
+        circuit.failure()
+    clock.now += 30
+    assert circuit.allow()
+    # One failure is enough while half-open
+    circuit.failure()
+    assert circuit.state == "open"
+    assert not circuit.allow()
+    clock.now += 30
+    assert circuit.allow()
+    circuit.success()
+    assert circuit.state == "closed"
+    assert circuit.allow()
+
+
+def test_abandoned_trial_can_be_retried(clock):
+    circuit = CircuitBreaker("test", failures=1, reset=30)
+    circuit.failure()
+    clock.now += 30
+    assert circuit.allow()
+    circuit.abandon()
+    assert circuit.allow()
+
+
+def test_guarded_counts_only_database_errors(monkeypatch):
+    monkeypatch.setattr(resilience, "breakers", {})
+
+    async def unavailable():
+        raise asyncio.TimeoutError()
+
+    async def rejected():
+        raise ValueError("bad query")
+
+    async def run():
+        for _ in range(resilience.BREAKER_FAILURES - 1):
+            with pytest.raises(asyncio.TimeoutError):
+                await resilience.guarded("shows", unavailable)
+        # The database answered; the failure count starts over
+        with pytest.raises(ValueError):
+            await resilience.guarded("shows", rejected)
+        assert resilience.breaker("shows").state == "closed"
+        for _ in range(resilience.BREAKER_FAILURES):
+            with pytest.raises(asyncio.TimeoutError):
+                await resilience.guarded("shows", unavailable)
+        with pytest.raises(CircuitOpen):
+            await resilience.guarded("shows", rejected)
+
+    asyncio.run(run())
@@ -0,0 +1,290 @@
+import asyncio
+import itertools
+from datetime import datetime, timedelta
+
+import pytest
+import pytz
+from pymongo.errors import BulkWriteError
+
+import seating
+from seating import RowRuns, SeatMap
+
+
+def layout(*rows, name="Stalls"):
+    return {"sections": [{"name": name, "rows": [{"name": chr(ord("A") + i), "seats": seats} for i, seats in enumerate(rows)]}]}
+
+
+# Allocator
+
+
+def test_take_splits_a_run():
+    row = RowRuns("A", 1, 10)
+    row.take(4, 3)
+    assert row.starts == [1, 7]
+    assert row.lengths == {1: 3, 7: 4}
+    assert row.max_run == 4
+    with pytest.raises(ValueError):
+        row.take(3, 2)
+
+
+def test_best_block_is_centred_in_the_row():
+    row = RowRuns("A", 1, 10)
+    assert row.best_block(2) == 5
+    assert row.best_block(11) is None
+
+
+def test_allocate_prefers_rows_about_forty_percent_back():
+    seat_map = SeatMap(layout(10, 10, 10, 10, 10, 10))
+    # Row C (seats 21-30) is at depth 0.4, so the block is centred there
+    assert seat_map.allocate(4) == [24, 25, 26, 27]
+    assert not seat_map.is_free(25)
+    assert seat_map.is_free(23)
+
+
+def test_allocate_splits_the_group_over_the_largest_runs():
+    seat_map = SeatMap(layout(5, 5), taken=[3, 8])
+    # Runs are [1-2], [4-5], [6-7], [9-10]; nothing seats 3 together
+    seats = seat_map.allocate(3)
+    assert len(seats) == 3 and len(set(seats)) == 3
+    assert not any(seat_map.is_free(seat) for seat in seats)
+    assert sum(row.free() for row in seat_map.rows) == 5
+
+
+def test_allocate_refuses_more_seats_than_are_free():
+    seat_map = SeatMap(layout(4), taken=[1, 2])
+    with pytest.raises(ValueError):
+        seat_map.allocate(3)
+    # A refused allocation takes nothing
+    assert seat_map.allocate(2) == [3, 4]
+
+
+def test_halls_without_a_layout_are_sized_from_tickets_left_and_sales():
+    seat_map = SeatMap.for_event({"ticketsLeft": 25}, taken=[1, 2, 3, 4, 5])
+    assert seat_map.capacity == 30
+    assert [row.length for row in seat_map.rows] == [20, 10]
+    assert not seat_map.is_free(5) and seat_map.is_free(6)
+
+
+def test_holds_do_not_grow_a_hall_without_a_layout():
+    # Seats 1-3 are sold and 4-5 only held; held seats are still counted in ticketsLeft
+    seat_map = SeatMap.for_event({"ticketsLeft": 7}, taken=[1, 2, 3, 4, 5], sold=3)
+    assert seat_map.capacity == 10
+
+
+def test_sold_out_show_without_a_layout_has_no_seats():
+    seat_map = SeatMap.for_event({"ticketsLeft": 0})
+    assert seat_map.rows == []
+    assert not seat_map.is_free(1)
+    with pytest.raises(ValueError):
+        seat_map.allocate(1)
+
+
+# Claims
+
+
+def matches(doc, query):
+    for key, condition in query.items():
+        if key == "$or":
+            if not any(matches(doc, branch) for branch in condition):
+                return False
+            continue
+        value = doc.get(key)
+        if isinstance(condition, dict):
+            for op, operand in condition.items():
+                if op == "$in" and value not in operand:
+                    return False
+                if op == "$gt" and not (value is not None and value > operand):
+                    return False
+                if op == "$lte" and not (value is not None and value <= operand):
+                    return False
+        elif value != condition:
+            return False
+    return True
+
+
+class Result:
+    def __init__(self, **fields):
+        self.__dict__.update(fields)
+
+
+class Cursor:
+    def __init__(self, docs):
+        self.docs = docs
+
+    def max_time_ms(self, _):
+        return self
+
+    async def to_list(self, _):
+        return self.docs
+
+
+class ClaimsCollection:
+    # Just enough of a collection for seating.py, with Mongo's duplicate _id behaviour
+    def __init__(self):
+        self.docs = {}
+
+    async def insert_many(self, docs, ordered=True):
+        errors = []
+        for index, doc in enumerate(docs):
+            if doc["_id"] in self.docs:
+                errors.append({"index": index, "code": 11000})
+            else:
+                self.docs[doc["_id"]] = dict(doc)
+        if errors:
+            raise BulkWriteError({"writeErrors": errors})
+
+    async def delete_many(self, query):
+        gone = [key for key, doc in self.docs.items() if matches(doc, query)]
+        for key in gone:
+            del self.docs[key]
+        return Result(deleted_count=len(gone))
+
+    async def update_many(self, query, update):
+        changed = [doc for doc in self.docs.values() if matches(doc, query)]
+        for doc in changed:
+            doc.update(update.get("$set", {}))
+            for field in update.get("$unset", {}):
+                doc.pop(field, None)
+        return Result(modified_count=len(changed))
+
+    def find(self, query, projection=None):
+        return Cursor([dict(doc) for doc in self.docs.values() if matches(doc, query)])
+
+
+event_ids = (f"event{i}" for i in itertools.count())
+
+
+@pytest.fixture
+def claims(monkeypatch):
+    collection = ClaimsCollection()
+    legacy = {}
+
+    async def booked_seats(event_id):
+        return legacy.get(event_id, [])
+
+    monkeypatch.setattr(seating, "seat_claims_collection", collection)
+    monkeypatch.setattr(seating, "booked_seats", booked_seats)
+    collection.legacy = legacy
+    return collection
+
+
+def show():
+    return next(event_ids), {"layout": layout(10, 10, 10)}
+
+
+def sold_to(claims, payment_id):
+    return sorted(doc["seat"] for doc in claims.docs.values() if doc.get("paymentId") == payment_id)
+
+
+def test_a_stale_map_cannot_sell_a_claimed_seat(claims):
+    event_id, event = show()
+
+    async def run():
+        # Worker 1 caches its map, then worker 2 sells the best block behind its back
+        await seating.get_seat_map(event_id, event)
+        other_worker = SeatMap(event["layout"]).allocate(4)
+        assert not await seating.insert_claims(event_id, other_worker, seating.sold_fields("b@x.com", "pay-b"))
+        seats = await seating.allocate_seats(event_id, event, 4, "a@x.com", "pay-a")
+        return other_worker, seats
+
+    other_worker, seats = asyncio.run(run())
+    assert not set(seats) & set(other_worker)
+    assert sold_to(claims, "pay-a") == sorted(seats)
+
+
+def test_picked_seats_are_all_or_nothing(claims):
+    event_id, event = show()
+
+    async def run():
+        assert await seating.claim_seats(event_id, event, [5], "b@x.com", "pay-b")
+        seating.forget_seat_map(event_id)
+        # Seat 5 is taken, so 4 and 6 must not stay claimed either
+        assert not await seating.claim_seats(event_id, event, [4, 5, 6], "a@x.com", "pay-a")
+
+    asyncio.run(run())
+    assert sold_to(claims, "pay-a") == []
+    assert sold_to(claims, "pay-b") == [5]
+
+
+def test_conflicting_insert_rolls_back_its_own_claims(claims):
+    event_id, _ = show()
+
+    async def run():
+        await seating.insert_claims(event_id, [5], seating.sold_fields("b@x.com", "pay-b"))
+        return await seating.insert_claims(event_id, [4, 5, 6], seating.sold_fields("a@x.com", "pay-a"))
+
+    assert asyncio.run(run()) == [5]
+    assert sold_to(claims, "pay-a") == []
+
+
+def test_seats_sold_before_claims_existed_cannot_be_picked(claims):
+    event_id, event = show()
+    claims.legacy[event_id] = [7]
+
+    async def run():
+        return await seating.claim_seats(event_id, event, [7], "a@x.com", "pay-a")
+
+    assert not asyncio.run(run())
+    assert claims.docs == {}
+
+
+def test_seats_outside_the_hall_cannot_be_picked(claims):
+    event_id, event = show()
+    assert not asyncio.run(seating.claim_seats(event_id, event, [31], "a@x.com", "pay-a"))
+
+
+def test_expired_holds_are_reclaimed(claims):
+    event_id, _ = show()
+    past = datetime.now(pytz.UTC) - timedelta(seconds=1)
+    claims.docs[seating.claim_id(event_id, 5)] = {
+        "_id": seating.claim_id(event_id, 5), "eventId": event_id, "seat": 5,
+        "status": "held", "email": "b@x.com", "session": "s-b", "expireAt": past,
+    }
+
+    async def run():
+        return await seating.insert_claims(event_id, [5], seating.sold_fields("a@x.com", "pay-a"))
+
+    assert asyncio.run(run()) == []
+    assert sold_to(claims, "pay-a") == [5]
+
+
+def test_a_payment_takes_over_its_own_hold(claims):
+    event_id, event = show()
+
+    async def run():
+        held = await seating.hold_seats(event_id, event, 3, "A@x.com", "s-a")
+        # Nobody else can get the held seats meanwhile
+        seating.forget_seat_map(event_id)
+        others = await seating.allocate_seats(event_id, event, 3, "b@x.com", "pay-b")
+        taken = await seating.take_hold(event_id, "a@x.com", 3, None, "pay-a")
+        return held, others, taken
+
+    held, others, taken = asyncio.run(run())
+    assert not set(held) & set(others)
+    assert taken == {"seats": held, "session": "s-a"}
+    assert sold_to(claims, "pay-a") == held
+    assert not any(doc["status"] == "held" for doc in claims.docs.values())
+
+
+def test_a_payment_for_something_else_releases_the_hold(claims):
+    event_id, event = show()
+
+    async def run():
+        await seating.hold_seats(event_id, event, 3, "a@x.com", "s-a")
+        return await seating.take_hold(event_id, "a@x.com", 2, None, "pay-a")
+
+    assert asyncio.run(run()) is None
+    assert claims.docs == {}
+
+
+def test_release_seats_only_frees_the_failed_payment(claims):
+    event_id, event = show()
+
+    async def run():
+        await seating.allocate_seats(event_id, event, 2, "a@x.com", "pay-a")
+        await seating.allocate_seats(event_id, event, 2, "b@x.com", "pay-b")
+        await seating.release_seats(event_id, "pay-a")
+
+    asyncio.run(run())
+    assert sold_to(claims, "pay-a") == []
+    assert len(sold_to(claims, "pay-b")) == 2